@@ -47,14 +47,19 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-ASSETS = PROJECT_ROOT / "assets"
+STATIC = PROJECT_ROOT / "static"  # served at app/static/ (.streamlit/config.toml)
 
 # --- 2. CORE UTILITIES ---
+@st.cache_resource(show_spinner=False)
+def _b64_cached(path: str, mtime: float) -> str:
+    # mtime is part of the cache key: replacing the image invalidates it
+    return base64.b64encode(Path(path).read_bytes()).decode("utf-8")
+
 def b64(path: Path) -> str:
-    """Converts an image file to a base64 string for HTML embedding."""
+    """Converts an image file to a base64 string for HTML embedding (read once per process)."""
     if not path.exists(): 
         return ""
-    return base64.b64encode(path.read_bytes()).decode("utf-8")
+    return _b64_cached(str(path), path.stat().st_mtime)
 
 def load_registry():
     """Loads the list of available apps from apps.yaml."""
@@ -91,8 +96,9 @@ def safe_navigate(page_path, app_name):
         st.error(f"Navigation Error: {e}")
         st.exception(e)
 
-# Authentication Barrier
-require_shared_password()
+# Authentication Barrier (authenticated reruns skip the call entirely)
+if st.session_state.get("auth_ok") is not True:
+    require_shared_password()
 
 # --- LOGIN TRANSITION ANIMATION (CINEMA GRADE) ---
 # Shows once per session after auth, then disappears.
@@ -102,7 +108,7 @@ if "login_splash_done" not in st.session_state:
 authed = bool(st.session_state.get("auth_ok"))
 
 if authed and not st.session_state["login_splash_done"]:
-    logo_path = ASSETS / "haycash_logo.jpg"
+    logo_path = STATIC / "haycash_logo.jpg"
     logo_b64_local = b64(logo_path) if logo_path.exists() else ""
 
     st.markdown(
@@ -255,7 +261,7 @@ if authed and not st.session_state["login_splash_done"]:
 
 # --- 3. LOAD DATA & ASSETS ---
 apps = load_registry()
-logo_b64 = b64(ASSETS / "haycash_logo.jpg")
+logo_b64 = b64(STATIC / "haycash_logo.jpg")
 
 # --- 4. NAVIGATION MAP ---
 PAGE_BY_ID = {
@@ -306,9 +312,8 @@ st.markdown(f"""
             to {{ transform: translateY(-550px); }}
         }}
 
-        [data-testid="stSidebar"], 
-        [data-testid="collapsedControl"], 
-        section[data-testid="stSidebar"],
+        [data-testid="stSidebar"],
+        [data-testid="collapsedControl"],
         header[data-testid="stHeader"] {{
             display: none !important;
             visibility: hidden !important;
@@ -38,9 +38,12 @@ ALLOWED_STATUSES = [
     "Comité",
 ]
 
-DEFAULT_REVIEWED_CSV = Path("data") / "reviewed_leads_app.csv"
-DEFAULT_SNAPSHOT_CSV = Path("data") / "snapshot.csv"
-WWW_DIR = Path("www")
+# Resolved from this file, not the cwd: the toolbox runs this app in-process
+# and the cwd is shared by every session
+_APP_DIR = Path(__file__).resolve().parent
+DEFAULT_REVIEWED_CSV = _APP_DIR / "data" / "reviewed_leads_app.csv"
+DEFAULT_SNAPSHOT_CSV = _APP_DIR / "data" / "snapshot.csv"
+WWW_DIR = _APP_DIR / "www"
 
 
 def safe_read_csv(path: str | Path) -> pd.DataFrame | None:
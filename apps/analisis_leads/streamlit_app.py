@@ -7,11 +7,6 @@ _APP_DIR = Path(__file__).resolve().parent
 if str(_APP_DIR) not in sys.path:
     sys.path.insert(0, str(_APP_DIR))
 
-try:
-    os.chdir(str(_APP_DIR))
-except Exception:
-    pass
-
 import shutil
 import subprocess
 from datetime import date, timedelta
@@ -218,7 +213,7 @@ review_store = ReviewStoreDB(engine, "reviewed_leads_app")
 reviewed_tbl = review_store.read_or_empty()
 # =========================================================================
 
-blocked_rfcs = load_blocked_rfcs(Path("www"))
+blocked_rfcs = load_blocked_rfcs(_APP_DIR / "www")
 snapshot = build_snapshot_view(raw_snapshot)
 
 if not snapshot.empty and "rfc" in snapshot.columns and blocked_rfcs:
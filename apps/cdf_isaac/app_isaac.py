@@ -33,6 +33,10 @@ import jellyfish
 
 DIAG_MAX = 1200
 
+# Data files next to this script, independent of the process cwd (the
+# toolbox wrapper no longer chdirs into apps/cdf_isaac before running it)
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
 TARGET_COLS = [
     "Nombres","last_name","second_last_name","birthday_at","RFC","curp","nationality",
     "industry","industry_SAT",
@@ -227,7 +231,7 @@ def extract_tokens(x: str) -> List[str]:
 def load_sat_catalogs() -> Dict[str, Any]:
     # Read PF
     try:
-        actividades_pf = pd.read_csv("lista_PF.csv", encoding="utf-8", dtype=str, keep_default_na=False)
+        actividades_pf = pd.read_csv(os.path.join(APP_DIR, "lista_PF.csv"), encoding="utf-8", dtype=str, keep_default_na=False)
     except Exception:
         actividades_pf = pd.DataFrame({"valor": []})
     if "valor" not in actividades_pf.columns:
@@ -244,7 +248,7 @@ def load_sat_catalogs() -> Dict[str, Any]:
 
     # Read PM
     try:
-        actividades_pm = pd.read_csv("lista_PM.csv", encoding="utf-8", dtype=str, keep_default_na=False)
+        actividades_pm = pd.read_csv(os.path.join(APP_DIR, "lista_PM.csv"), encoding="utf-8", dtype=str, keep_default_na=False)
     except Exception:
         actividades_pm = pd.DataFrame({"valor": []})
     if "valor" not in actividades_pm.columns:
@@ -16,11 +16,13 @@ Layout corrections kept:
 - Header: block written as 7 digits (BBVA requires 7)
 - Summary: operation code 30, block matches header, total = SUM(importe) cents
 """
+import re
+from functools import reduce
+
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import sys
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
 from datetime import datetime
 
 # =======================
@@ -31,28 +33,44 @@ RFC_EMISOR_DEFAULT  = "PBI*061115SC6"
 TITULAR_DEFAULT     = "HAYCASH SAPI DE CV"
 BLOQUE_DEFAULT      = "120000"   # your original value (we output as 7 digits: zfill)
 
+# Only columns the generator reads; anything else in the sheet is skipped at load time
+NEEDED_COLS = ("Importe", "ID Cliente", "Nombre del cliente", "Referencia", "Titular del servicio")
+
+# Constant record fragments (same for every record, built once)
+_RAZON_40  = BUSINESS_EMISOR_STR.upper()[:40].ljust(40)
+_RFC_18    = RFC_EMISOR_DEFAULT.upper()[:18].ljust(18)
+_FILLER_21 = " " * 21
+_FILLER_24 = " " * 24
+_FILLER_25 = " " * 25
+_FILLER_182 = " " * 182
+_FILLER_257 = " " * 257
+_PAD_300   = b" " * 300
+_NON_DIGIT_RE = re.compile(r"\D")
+_MAX_CENTS_15 = 10 ** 15  # amount/IVA fields are 15 digits
+
 
 # ---------- helpers (byte-stable) ---------------------------------------
-def to_fixed_300_bytes(line: str) -> bytes:
-    b = line.encode("latin-1", errors="replace")
+def to_fixed_300_bytes(line: str | bytes) -> bytes:
+    # records that are already latin-1 bytes skip the encode
+    b = line if isinstance(line, bytes) else line.encode("latin-1", errors="replace")
     if len(b) < 300:
-        b = b + (b" " * (300 - len(b)))
+        b = b + _PAD_300[len(b):]
     elif len(b) > 300:
         b = b[:300]
     return b
 
 
-def write_fixed_file(txt_path: str, lines: list[str], final_crlf: bool = True) -> str:
+def write_payload(txt_path, payload: bytes):
+    if hasattr(txt_path, "write"):
+        txt_path.write(payload)
+        return txt_path
     with open(txt_path, "wb") as f:
-        for i, s in enumerate(lines):
-            f.write(to_fixed_300_bytes(s))
-            if i < len(lines) - 1 or final_crlf:
-                f.write(b"\r\n")
+        f.write(payload)
     return txt_path
 
 
 def only_digits(s: str) -> str:
-    return "".join(ch for ch in str(s or "") if ch.isdigit())
+    return _NON_DIGIT_RE.sub("", str(s or ""))
 
 
 def n_width_digits(s: str, width: int) -> str:
@@ -65,6 +83,51 @@ def n_width_digits(s: str, width: int) -> str:
     return d.zfill(width)
 
 
+def text_col(df: pd.DataFrame, name: str, default: str = "") -> pd.Series:
+    """
+    Column-wise equivalent of `str(row.get(name, default))`: missing column -> default.
+    """
+    if name in df.columns:
+        return df[name].astype(str)
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+def n_width_digits_col(s: pd.Series, width: int) -> pd.Series:
+    """
+    Vectorized `n_width_digits` over a whole column.
+    """
+    return s.astype(str).str.replace(_NON_DIGIT_RE, "", regex=True).str[-width:].str.zfill(width)
+
+
+def fixed_40_col(s: pd.Series) -> np.ndarray:
+    """
+    Vectorized `x.upper()[:40].ljust(40)`. Upper-casing can make a name
+    longer ("ß" -> "SS"), so it runs in pandas, which keeps the whole result;
+    only then is it cut to 40 and padded.
+    """
+    return s.astype(str).str.upper().str[:40].str.ljust(40).to_numpy(dtype=str)
+
+
+def _const_byte_matrix(text: str, n: int) -> np.ndarray:
+    """
+    `text` (latin-1) repeated on n rows, as an (n, len) uint8 view.
+    """
+    b = np.frombuffer(text.encode("latin-1", errors="replace"), dtype=np.uint8)
+    return np.broadcast_to(b, (n, len(b)))
+
+
+def _byte_matrix(col: np.ndarray) -> np.ndarray | None:
+    """
+    (n, width) uint8 matrix of a str column, or None if the rows do not all
+    encode to the same number of bytes.
+    """
+    b = np.char.encode(np.asarray(col, dtype=str), "latin-1", "replace")
+    width = b.dtype.itemsize
+    if width == 0 or (np.char.str_len(b) != width).any():
+        return None
+    return b.view(np.uint8).reshape(len(b), width)
+
+
 # ---------- core generator (keeps your structure) -----------------------
 class BBVAFixedGenerator:
     @staticmethod
@@ -72,9 +135,6 @@ class BBVAFixedGenerator:
         # BBVA requires 7 chars for block; keep your value but left-pad with zeros
         bloque_7 = n_width_digits(bloque, 7)
 
-        razon_40 = BUSINESS_EMISOR_STR.upper()[:40].ljust(40)
-        rfc_18   = RFC_EMISOR_DEFAULT.upper()[:18].ljust(18)
-
         # Build header deterministically (byte clamp happens on write)
         parts = [
             "01",
@@ -87,10 +147,10 @@ class BBVAFixedGenerator:
             fecha,               # date
             "01",                # currency
             "00",                # reject cause
-            " " * 25,            # filler
-            razon_40,            # business/razon social (40)
-            rfc_18,              # RFC (18)
-            " " * 182            # filler to 300
+            _FILLER_25,          # filler
+            _RAZON_40,           # business/razon social (40)
+            _RFC_18,             # RFC (18)
+            _FILLER_182          # filler to 300
         ]
         return "".join(parts)
 
@@ -119,7 +179,7 @@ class BBVAFixedGenerator:
             "01",
             f"{amount_cents:015d}",
             fecha,
-            " " * 24,
+            _FILLER_24,
             "51",
             fecha,
             "012",
@@ -132,10 +192,109 @@ class BBVAFixedGenerator:
             ref_7,
             legend,
             "00",
-            " " * 21
+            _FILLER_21
         ]
         return ''.join(parts)
 
+    @staticmethod
+    def _detail_fields(df: pd.DataFrame, fecha: str, start_ref: int) -> tuple[list, int]:
+        """
+        Per-column pieces of the detail records, in layout order: constant runs
+        as str, per-row fields as equal-length arrays. Also returns the total in cents.
+        """
+        importe = text_col(df, "Importe", "0").str.replace(",", "", regex=False)
+        importe = importe.where(importe != "", "0").astype(float).to_numpy()
+        # np.rint rounds half-to-even like round(); same float ops as detail() -> same cents
+        amount_cents = np.rint(importe * 100)
+        iva_cents = np.rint(importe * 0.16 * 100)
+
+        # NaN/inf (and amounts past the 15-digit field) would wrap silently in
+        # the int64 cast; detail() raised on them, so refuse the file here too
+        bad = ~np.isfinite(amount_cents) | (np.abs(amount_cents) >= _MAX_CENTS_15)
+        if bad.any():
+            i = int(np.flatnonzero(bad)[0])
+            raise ValueError(f"Importe inválido en la fila {df.index[i]}: {float(importe[i])!r}")
+        amount_cents = amount_cents.astype(np.int64)
+        iva_cents = iva_cents.astype(np.int64)
+
+        # numeric fields formatted in one C pass per column
+        n = len(df)
+        seq_7 = np.char.mod("%07d", np.arange(2, n + 2, dtype=np.int64))
+        ref_num = np.arange(int(start_ref), int(start_ref) + n, dtype=np.int64)
+        ref_7 = np.char.mod("%07d", np.abs(ref_num) % 10_000_000)  # == n_width_digits(ref_num, 7)
+
+        cli_20 = n_width_digits_col(text_col(df, "ID Cliente", "165197597"), 20).to_numpy(dtype=str)  # same default you had
+
+        titular = text_col(df, "Titular del servicio", TITULAR_DEFAULT)
+        titular = titular.where(titular != "", TITULAR_DEFAULT)
+
+        nom_40 = fixed_40_col(text_col(df, "Nombre del cliente"))
+        ref_40 = fixed_40_col(text_col(df, "Referencia"))
+        tit_40 = fixed_40_col(titular)
+
+        fields = [
+            "02",
+            seq_7,
+            "3001",
+            np.char.mod("%015d", amount_cents),
+            f"{fecha}{_FILLER_24}51{fecha}01201",  # constant run, joined once per call
+            cli_20,
+            nom_40,
+            ref_40,
+            tit_40,
+            np.char.mod("%015d", iva_cents),
+            ref_7,
+            ref_40,  # legend: ONLY reference text
+            "00" + _FILLER_21,
+        ]
+        return fields, int(amount_cents.sum())
+
+    @staticmethod
+    def details(df: pd.DataFrame, fecha: str, start_ref: int = 1204000) -> tuple[list[bytes], int]:
+        """
+        Same records as calling `detail` once per row, built column-wise and
+        returned already clamped to 300 and latin-1 encoded (one vectorized pass).
+        Returns (detail records, total importe in cents).
+        """
+        if len(df) == 0:
+            return [], 0
+
+        fields, total_cents = BBVAFixedGenerator._detail_fields(df, fecha, start_ref)
+        lines = reduce(np.char.add, fields)
+        # latin-1 (errors="replace") is 1 byte per char: clamping to U300 == clamping bytes
+        records = np.char.ljust(lines.astype("U300"), 300)
+        records = np.char.encode(records, "latin-1", "replace")
+        return records.tolist(), total_cents
+
+    @staticmethod
+    def details_block(df: pd.DataFrame, fecha: str, start_ref: int = 1204000) -> tuple[bytes, int]:
+        """
+        All detail records as one CRLF-terminated bytes buffer, assembled into
+        an (N, 302) uint8 matrix one field-column at a time (no per-row work).
+        Falls back to `details` when a field is not fixed-width across rows.
+        """
+        n = len(df)
+        if n == 0:
+            return b"", 0
+
+        fields, total_cents = BBVAFixedGenerator._detail_fields(df, fecha, start_ref)
+        cols = []
+        for f in fields:
+            m = _const_byte_matrix(f, n) if isinstance(f, str) else _byte_matrix(f)
+            if m is None:
+                records, total_cents = BBVAFixedGenerator.details(df, fecha, start_ref)
+                return b"".join(r + b"\r\n" for r in records), total_cents
+            cols.append(m)
+
+        width = sum(m.shape[1] for m in cols)
+        if width > 300:
+            mat = np.hstack(cols)[:, :300]
+            cols = [mat]
+        elif width < 300:
+            cols.append(_const_byte_matrix(" " * (300 - width), n))
+        cols.append(_const_byte_matrix("\r\n", n))
+        return np.hstack(cols).tobytes(), total_cents
+
     @staticmethod
     def summary(last_detail_seq: int, num_regs: int, total_importe_cents: int, bloque: str = BLOQUE_DEFAULT) -> str:
         bloque_7 = n_width_digits(bloque, 7)
@@ -146,59 +305,67 @@ class BBVAFixedGenerator:
             bloque_7,
             f"{num_regs:07d}",
             f"{total_importe_cents:018d}",
-            " " * 257
+            _FILLER_257
         ]
         return "".join(parts)
 
 
 # ---------- high-level API (dynamic) ------------------------------------
-def generate_bbva_file(excel_path, txt_path, fecha: str, start_ref=1204000, bloque: str = BLOQUE_DEFAULT):
+def _is_needed_col(name) -> bool:
+    return name in NEEDED_COLS
+
+
+def read_input_frame(excel_path, ext: str | None = None) -> pd.DataFrame:
+    """
+    Loads only NEEDED_COLS (as str). Missing columns are fine: the generator
+    falls back to its defaults for them.
+    `excel_path` can be a path or a binary file-like; for file-likes pass `ext`.
+    """
+    if ext is None:
+        ext = Path(getattr(excel_path, "name", excel_path)).suffix
+    ext = ext.lower()
+    if ext in (".xls", ".xlsx", ".xlsm"):
+        # pandas already opens xlsx with openpyxl read_only/data_only
+        df = pd.read_excel(excel_path, dtype=str, usecols=_is_needed_col)
+    else:
+        df = pd.read_csv(excel_path, dtype=str, usecols=_is_needed_col, engine="c", low_memory=True)
+    return df.fillna("")
+
+
+def generate_bbva_file(excel_path, txt_path, fecha: str, start_ref=1204000, bloque: str = BLOQUE_DEFAULT,
+                       ext: str | None = None):
+    # excel_path / txt_path: paths or file-likes (Streamlit passes BytesIO, no temp files)
     # use TODAY if date box left empty
     if not fecha or fecha.strip() == "":
         fecha = datetime.now().strftime("%Y%m%d")
 
-    ext = Path(excel_path).suffix.lower()
-    df = (pd.read_excel(excel_path, dtype=str) if ext in (".xls", ".xlsx", ".xlsm")
-          else pd.read_csv(excel_path, dtype=str))
-    df = df.fillna("")
+    df = read_input_frame(excel_path, ext=ext)
 
-    lines = [BBVAFixedGenerator.header(fecha, bloque=bloque)]
+    header = to_fixed_300_bytes(BBVAFixedGenerator.header(fecha, bloque=bloque))
 
-    total_importe_cents = 0
-    ref_counter = int(start_ref)
-
-    for idx, row in df.iterrows():
-        # EXACTLY like your original: use .get with defaults and never require column names.
-        importe = float(str(row.get("Importe", "0")).replace(",", "") or "0")
-        amount_cents = int(round(importe * 100))
-        total_importe_cents += amount_cents
-
-        line = BBVAFixedGenerator.detail(
-            seq=idx + 2,
-            fecha=fecha,
-            importe=importe,
-            ref_num=ref_counter,
-            cliente_id=str(row.get("ID Cliente", "165197597")),  # same default you had
-            nombre_cliente=str(row.get("Nombre del cliente", "")),
-            referencia=str(row.get("Referencia", "")),
-            titular_servicio=str(row.get("Titular del servicio", TITULAR_DEFAULT)) or TITULAR_DEFAULT
-        )
-        lines.append(line)
-        ref_counter += 1
+    # EXACTLY like your original: defaults per column, never require column names.
+    # Built column-wise into one CRLF-terminated buffer instead of one `detail(...)` call per row.
+    detail_block, total_importe_cents = BBVAFixedGenerator.details_block(df, fecha, start_ref)
 
     last_seq = len(df) + 1
-    lines.append(BBVAFixedGenerator.summary(
+    summary = to_fixed_300_bytes(BBVAFixedGenerator.summary(
         last_detail_seq=last_seq,
         num_regs=len(df),
         total_importe_cents=total_importe_cents,
         bloque=bloque
     ))
 
-    return write_fixed_file(txt_path, lines, final_crlf=True)
+    # 300-byte records, each ending in CRLF (details_block already ends its lines)
+    return write_payload(txt_path, header + b"\r\n" + detail_block + summary + b"\r\n")
 
 
 # ---------- GUI ----------------------------------------------------------
 def main_gui():
+    # Tk only for the desktop GUI: the Streamlit page imports this module on
+    # servers without Tcl/Tk
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+
     root = tk.Tk()
     root.title("BBVA Domiciliación – FIXED layout (300 bytes)")
     root.geometry("560x320")
@@ -137,25 +137,41 @@ def generate_file_bytes(
     total_amount = 0.0
     ref_count = int(ref_start)
 
-    for idx, row in df.iterrows():
+    # Pull each column once as a plain array (same defaults as row.get) instead of
+    # materializing a Series per row with iterrows.
+    n_rows = len(df)
+
+    def _col(name: str, default):
+        return df[name].to_numpy(dtype=object) if name in df.columns else [default] * n_rows
+
+    rows = zip(
+        _col("Importe", 0),
+        _col("Cuenta cargo", ""),
+        _col("Banco", "000"),
+        _col("Nombre del cliente", ""),
+        _col("Referencia", ""),
+        _col("Titular del servicio", "HAYCASH"),
+    )
+
+    for idx, (importe_v, cta_v, banco_v, nombre_v, ref_v, titular_v) in enumerate(rows):
         seq = idx + 2
 
         try:
-            imp = float(str(row.get("Importe", 0)).replace(",", ""))
+            imp = float(str(importe_v).replace(",", ""))
         except Exception:
             imp = 0.0
         total_amount += imp
 
-        cta = str(row.get("Cuenta cargo", "")).strip()
+        cta = str(cta_v).strip()
         tipo_cta = infer_tipo_cuenta(cta)
 
-        banco_raw = str(row.get("Banco", "000")).strip()
+        banco_raw = str(banco_v).strip()
         banco_digits = "".join(filter(str.isdigit, banco_raw))
         banco_dest = banco_digits[-3:] if len(banco_digits) >= 3 else "000"
 
-        nombre = normalize_text(row.get("Nombre del cliente", ""), 40)
-        ref_alf = normalize_text(row.get("Referencia", ""), 40)
-        titular = normalize_text(row.get("Titular del servicio", "HAYCASH"), 40)
+        nombre = normalize_text(nombre_v, 40)
+        ref_alf = normalize_text(ref_v, 40)
+        titular = normalize_text(titular_v, 40)
         leyenda = ref_alf
 
         imp_cents = int(round(imp * 100))
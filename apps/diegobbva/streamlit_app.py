@@ -1,33 +1,39 @@
 # -----------------------------
 # Bootstrap for Streamlit Cloud multipage execution
-# - Ensures local module imports work (codigo_diego)
-# - Keeps relative-path behavior consistent if the original script expects it
+# - Loads the local logic module (bbva_domiciliacion_fixed) by file path, once per process
+# - No sys.path / cwd mutation: Streamlit reruns this script on every widget change
 # -----------------------------
-import os
+import importlib.util
+import io
 import sys
 from pathlib import Path
 
-_APP_DIR = Path(__file__).resolve().parent
+import streamlit as st
 
-if str(_APP_DIR) not in sys.path:
-    sys.path.insert(0, str(_APP_DIR))
+_APP_DIR = Path(__file__).resolve().parent
 
-try:
-    os.chdir(str(_APP_DIR))
-except Exception:
-    pass
 
+def _load_local(name: str):
+    """
+    Import `<_APP_DIR>/<name>.py` once; later reruns reuse the sys.modules entry.
+    """
+    mod = sys.modules.get(name)
+    if mod is None:
+        spec = importlib.util.spec_from_file_location(name, _APP_DIR / f"{name}.py")
+        mod = importlib.util.module_from_spec(spec)
+        sys.modules[name] = mod
+        spec.loader.exec_module(mod)
+    return mod
 
-import streamlit as st
-import tempfile
 
-# Import original logic without changes
-import codigo_diego as logic
+# 300-byte BBVA generator (generate_bbva_file + the emisor constants shown below);
+# codigo_diego is the template-based script and has no generate_bbva_file
+logic = _load_local("bbva_domiciliacion_fixed")
 
 
 def _logic_attr(*names: str, default: str = "") -> str:
     """
-    Return the first attribute that exists in codigo_diego, otherwise default.
+    Return the first attribute that exists in the logic module, otherwise default.
     This keeps business logic untouched while allowing wrapper to work across versions.
     """
     for n in names:
@@ -44,10 +50,21 @@ def _safe_int(s: str, default: int) -> int:
         return default
 
 
-# Try multiple possible constant names used across versions
-BLOQUE_DEFAULT = _logic_attr("BLOQUE_DEFAULT", "BLOQUE", default="")  # fallback empty if unknown
-RFC_EMISOR_DEFAULT = _logic_attr("RFC_EMISOR_DEFAULT", "RFC_EMISOR", default="")
-BUSINESS_EMISOR_STR = _logic_attr("BUSINESS_EMISOR_STR", "RAZON_SOCIAL", "BUSINESS_EMISOR", default="")
+@st.cache_data
+def _logic_defaults() -> tuple[str, str, str]:
+    """
+    Read-only constants from the logic module, resolved once per process (the
+    module itself is loaded once, see _load_local).
+    """
+    # Try multiple possible constant names used across versions
+    return (
+        _logic_attr("BLOQUE_DEFAULT", "BLOQUE", default=""),  # fallback empty if unknown
+        _logic_attr("RFC_EMISOR_DEFAULT", "RFC_EMISOR", default=""),
+        _logic_attr("BUSINESS_EMISOR_STR", "RAZON_SOCIAL", "BUSINESS_EMISOR", default=""),
+    )
+
+
+BLOQUE_DEFAULT, RFC_EMISOR_DEFAULT, BUSINESS_EMISOR_STR = _logic_defaults()
 
 st.set_page_config(page_title="BBVA Domiciliación (300 bytes)", layout="centered")
 
@@ -83,21 +100,20 @@ if st.button("Generar TXT", type="primary"):
     start_ref = _safe_int(ref_inicial, 1204000)
     bloque = (bloque_override or BLOQUE_DEFAULT)
 
-    with tempfile.TemporaryDirectory() as td:
-        in_path = os.path.join(td, uploaded.name)
-        with open(in_path, "wb") as f:
-            f.write(uploaded.getbuffer())
+    # In-memory in/out: no temp-dir copy of the upload or re-read of the output
+    out_name = f"{Path(uploaded.name).stem}_BBVA_FIXED.txt"
+    out = io.BytesIO()
 
-        out_name = f"{Path(uploaded.name).stem}_BBVA_FIXED.txt"
-        out_path = os.path.join(td, out_name)
-
-        try:
-            logic.generate_bbva_file(in_path, out_path, fecha, start_ref, bloque)
-        except Exception as e:
-            st.exception(e)
-            st.stop()
+    try:
+        logic.generate_bbva_file(
+            io.BytesIO(uploaded.getvalue()), out, fecha, start_ref, bloque,
+            ext=Path(uploaded.name).suffix,
+        )
+    except Exception as e:
+        st.exception(e)
+        st.stop()
 
-        data = Path(out_path).read_bytes()
+    data = out.getvalue()
 
     st.success("Archivo generado.")
     st.download_button("Descargar TXT", data=data, file_name=out_name, mime="text/plain")
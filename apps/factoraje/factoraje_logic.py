@@ -13,19 +13,24 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from io import BytesIO
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
+import functools
 import json
+import os
 import re
 import threading
 
+import ijson
+import numpy as np
 import pandas as pd
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from lxml import etree
 from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 
 
@@ -33,11 +38,31 @@ from openpyxl.utils import get_column_letter
 # Helpers (mirrors R)
 # =======================
 
+_RFC_RE = re.compile(r"[A-Z0-9]{12,13}")
+_WS_RE = re.compile(r"\s+")
+_TRAIL_SLASH_RE = re.compile(r"/+$")
+_RFC_SPLIT_RE = re.compile(r"[\s,;\n\r]+")
+_NON_ALNUM_RE = re.compile(r"[^A-Z0-9]")
+
 def is_rfc(x: str) -> bool:
     if not isinstance(x, str):
         return False
     x = x.strip().upper()
-    return bool(x) and bool(re.fullmatch(r"[A-Z0-9]{12,13}", x))
+    return bool(x) and bool(_RFC_RE.fullmatch(x))
+
+def parse_rfc_list(raw: str) -> List[str]:
+    """
+    RFCs from free text (one per line or separated by , ;), cleaned,
+    validated and de-duplicated in input order.
+    """
+    parts = [p.strip().upper() for p in _RFC_SPLIT_RE.split(raw or "") if p.strip()]
+    rfcs: List[str] = []
+    for p in parts:
+        p2 = _NON_ALNUM_RE.sub("", p)
+        if is_rfc(p2):
+            if p2 not in rfcs:
+                rfcs.append(p2)
+    return rfcs
 
 def today_utc() -> date:
     # R uses Sys.Date(); treat as local date.
@@ -71,19 +96,124 @@ def _make_session() -> requests.Session:
     """
     sess = requests.Session()
     retry = Retry(
-        total=5,
-        backoff_factor=1.0,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET", "HEAD"],
+        total=4,
+        backoff_factor=0.3,
+        backoff_max=8,  # bound the tail: one flaky page can't stall an RFC for minutes
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=frozenset(["GET", "HEAD"]),
         raise_on_status=False,
         respect_retry_after_header=True,
     )
-    adapter = HTTPAdapter(max_retries=retry, pool_connections=20, pool_maxsize=20)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=32, pool_maxsize=64)
     sess.mount("http://", adapter)
     sess.mount("https://", adapter)
+    sess.headers.update({"User-Agent": "HayCash-Concentracion/1.0"})
     return sess
 
 
+@functools.lru_cache(maxsize=1)
+def shared_session() -> requests.Session:
+    """
+    One pooled session per process, so keep-alive connections (and TLS) to the
+    Syntage host survive across calls and Streamlit reruns.
+    X-API-Key stays per request: the session is shared by every Streamlit user.
+    """
+    return _make_session()
+
+
+def _xml_workers() -> int:
+    """
+    Thread cap for the CFDI download pool (HAYCASH_XML_WORKERS, default 32).
+    Kept <= the adapter pool_maxsize so threads don't wait on connection checkout.
+    """
+    try:
+        n = int(os.getenv("HAYCASH_XML_WORKERS", "32"))
+    except ValueError:
+        n = 32
+    return max(1, min(n, 64))
+
+
+def _page_slots() -> int:
+    """
+    Cap on in-flight invoice-page requests (HAYCASH_SYNTAGE_PAGE_SLOTS, default 16).
+    """
+    try:
+        n = int(os.getenv("HAYCASH_SYNTAGE_PAGE_SLOTS", "16"))
+    except ValueError:
+        n = 16
+    return max(1, min(n, 64))
+
+
+# Shared by every caller in the process: build_excel_for_rfcs runs up to 8 RFCs
+# at once and each RFC up to 8 date shards, so the pools alone would allow 64
+# concurrent Syntage requests; this keeps the total at _page_slots().
+_PAGE_SLOTS = threading.BoundedSemaphore(_page_slots())
+
+
+def _get_hydra_members(
+    sess: requests.Session,
+    url: str,
+    headers: Dict[str, str],
+    params: Dict[str, Any],
+    timeout: int = 35,
+) -> Optional[Any]:
+    """
+    GET one invoices page and return its hydra:member value as sent (list, or
+    a single object), None when it is missing or on HTTP/parse error. ijson
+    decodes it from the socket as it arrives instead of buffering the whole
+    body and parsing it a second time.
+    """
+    # the slot is held until the body is read, i.e. until ijson is done
+    with _PAGE_SLOTS:
+        try:
+            resp = sess.get(url, headers=headers, params=params, timeout=timeout, stream=True)
+            _set_api_mon(True, resp.status_code, resp.url)
+        except Exception:
+            _set_api_mon(False, None, url)
+            return None
+
+        with resp:
+            if not (200 <= resp.status_code < 300):
+                return None
+            try:
+                resp.raw.decode_content = True  # let urllib3 undo gzip/deflate
+                # the whole "hydra:member" value, not its ".item"s: an object
+                # stays an object and a missing key is None, as the callers expect
+                return next(ijson.items(resp.raw, "hydra:member", use_float=True), None)
+            except Exception:
+                return None
+
+
+# Predicates pushed into the invoices query (both header paths keep only
+# TipoDeComprobante I). Off with HAYCASH_SYNTAGE_SERVER_FILTERS=0; per base_url
+# they are dropped automatically if the server rejects them.
+_INVOICE_SERVER_FILTERS: Dict[str, str] = {"type": "I"}
+_SERVER_FILTERS_OK: Dict[str, bool] = {}
+
+
+def _get_invoice_page(
+    sess: requests.Session,
+    base: str,
+    url: str,
+    headers: Dict[str, str],
+    params: Dict[str, Any],
+) -> Optional[Any]:
+    if os.getenv("HAYCASH_SYNTAGE_SERVER_FILTERS", "1") == "0" or _SERVER_FILTERS_OK.get(base) is False:
+        return _get_hydra_members(sess, url, headers, params)
+
+    rows = _get_hydra_members(sess, url, headers, {**params, **_INVOICE_SERVER_FILTERS})
+    if rows is not None or _SERVER_FILTERS_OK.get(base):
+        _SERVER_FILTERS_OK[base] = True
+        return rows
+
+    # unknown server and the filtered call failed: retry plain, and only stop
+    # sending the filters if the plain call works (not a transient outage)
+    rows = _get_hydra_members(sess, url, headers, params)
+    if rows is not None:
+        _SERVER_FILTERS_OK[base] = False
+    return rows
+
+
 def is_xml_ct(content_type: Optional[str]) -> bool:
     if not content_type:
         return False
@@ -91,39 +221,124 @@ def is_xml_ct(content_type: Optional[str]) -> bool:
     return ("xml" in ct) or (ct.startswith("text/") and "xml" in ct)
 
 
-def _safe_get(d: Any, *keys: str) -> Optional[Any]:
+def _first_item(v: Any) -> Any:
+    if isinstance(v, list):
+        return v[0] if v else None
+    return v
+
+
+def _coalesce_cols(flat: pd.DataFrame, *cols: str, blank_is_missing: bool = False) -> pd.Series:
     """
-    Mirrors the R helper get(...) for a list/dict payload.
-    Tries multiple keys and returns the first non-empty.
+    First non-null value among `cols` of a json_normalize'd frame, column-wise
+    (lists -> first item). `blank_is_missing` mirrors the
+    `nested or fallback` chains, where "" also falls through.
     """
-    if not isinstance(d, dict):
-        return None
-    for k in keys:
-        if k in d and d[k] is not None:
-            v = d[k]
-            # hydra often returns scalars; sometimes lists
-            if isinstance(v, list) and v:
-                return v[0]
-            return v
-    return None
+    out = pd.Series(None, index=flat.index, dtype=object)
+    for c in cols:
+        if c not in flat.columns:
+            continue
+        v = flat[c].map(_first_item).astype(object)
+        if blank_is_missing:
+            v = v.where(v != "", None)
+        out = out.where(out.notna(), v)
+    return out
 
-def _safe_get_nested(d: Any, path: List[str]) -> Optional[Any]:
-    cur = d
-    for k in path:
-        if not isinstance(cur, dict):
-            return None
-        cur = cur.get(k)
-        if cur is None:
-            return None
-    if isinstance(cur, list) and cur:
-        return cur[0]
-    return cur
+
+def _to_str(v: Any) -> str:
+    # json_normalize stores an int field with gaps as float64 (123 -> 123.0);
+    # give integral floats back their int spelling, as str() of the JSON int
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def _str_col(s: pd.Series) -> pd.Series:
+    return s.map(_to_str, na_action="ignore").astype(object)
+
+
+def _num_col(s: pd.Series) -> pd.Series:
+    return pd.to_numeric(_str_col(s).str.replace(",", "", regex=False), errors="coerce")
+
+
+def _filter_proveedores(h: pd.DataFrame, rfc: str) -> pd.DataFrame:
+    """
+    Filtros ESTRICTOS p/ “proveedores”: received (receptor == rfc), from a
+    different emisor, TipoDeComprobante I, unique uuid.
+    Both header builders already upper-case rfc/tipo, so one boolean mask
+    is built without re-upper-casing each column.
+    """
+    rfc_u = rfc.upper()
+    uuid = h["uuid"]
+    mask = (
+        uuid.notna() & (uuid.astype(str) != "")
+        & (h["receptor_rfc"].fillna("") == rfc_u)
+        & (h["emisor_rfc"].fillna("") != rfc_u)
+        & (h["tipo"].fillna("") == "I")
+    )
+    h = h[mask].drop_duplicates(subset=["uuid"], keep="first").reset_index(drop=True)
+    return _categorize(h)
+
+
+# Low-cardinality, already upper-cased header columns: stored as categoricals so
+# the per-interval filters compare integer codes instead of strings.
+_CATEGORY_COLS = ("tipo", "moneda", "metodo", "emisor_rfc", "receptor_rfc")
+
+
+def _categorize(h: pd.DataFrame) -> pd.DataFrame:
+    for c in _CATEGORY_COLS:
+        if c in h.columns and not isinstance(h[c].dtype, pd.CategoricalDtype):
+            h[c] = h[c].astype("category")
+    return h
 
 
 # =========================================================
 # API: listar facturas (recibidas) y normalizar headers
 # =========================================================
 
+def _api_header_frame(items: List[Any]) -> pd.DataFrame:
+    """
+    Raw hydra:member items -> the _HEADER_COLS frame (same keys and fallbacks
+    as R), before the proveedor filters. One flattening pass (issuer.rfc,
+    receiver.name, ...) and column-wise coalescing instead of a key lookup
+    walk per invoice.
+    """
+    flat = pd.json_normalize([it for it in items if isinstance(it, dict)], max_level=1)
+    if flat.empty:
+        return pd.DataFrame()
+
+    uuid = _coalesce_cols(flat, "uuid", "id", "@id", "invoiceId", "documentId")
+    issued = _coalesce_cols(flat, "issuedAt", "issueDate", "date", "createdAt")
+    fecha = pd.to_datetime(_str_col(issued).str[:10], format="%Y-%m-%d", errors="coerce").dt.date
+
+    total = _num_col(_coalesce_cols(flat, "total", "totalAmount", "amount_total", "grandTotal", "importe_total"))
+    moneda = _str_col(_coalesce_cols(flat, "currency", "moneda"))
+    tipo_cambio = _num_col(_coalesce_cols(flat, "exchangeRate", "tipoCambio", "tipo_cambio"))
+    metodo = _str_col(_coalesce_cols(flat, "paymentMethod", "paymentType", "metodoPago"))
+    tipo = _str_col(_coalesce_cols(flat, "type", "tipoDeComprobante", "tipo_de_comprobante"))
+
+    # nested issuer/receiver and the literal "issuer.rfc"-style keys land in the same flat column
+    emisor_rfc = _coalesce_cols(flat, "issuer.rfc", "emitter.rfc", "issuer_tax_id", blank_is_missing=True)
+    emisor_nombre = _coalesce_cols(flat, "issuer.name", "emitter.name", blank_is_missing=True)
+    receptor_rfc = _coalesce_cols(flat, "receiver.rfc", "receiver_tax_id", blank_is_missing=True)
+    receptor_nombre = _coalesce_cols(flat, "receiver.name", blank_is_missing=True)
+
+    return pd.DataFrame(
+        {
+            "uuid": _str_col(uuid),
+            "fecha": fecha.where(fecha.notna(), None),
+            "total": total,
+            "moneda": moneda.str.upper(),
+            "tipo_cambio": tipo_cambio,
+            "metodo": metodo.str.replace(_WS_RE, "", regex=True).str.upper(),
+            "tipo": tipo.str.replace(_WS_RE, "", regex=True).str.upper(),
+            "emisor_rfc": _str_col(emisor_rfc).str.upper(),
+            "emisor_nombre": _str_col(emisor_nombre),
+            "receptor_rfc": _str_col(receptor_rfc).str.upper(),
+            "receptor_nombre": _str_col(receptor_nombre),
+        }
+    )
+
+
 def list_invoices_headers_api(
     base_url: str,
     api_key: str,
@@ -134,7 +349,7 @@ def list_invoices_headers_api(
     max_pages: int = 400,
     session: Optional[requests.Session] = None,
 ) -> pd.DataFrame:
-    base = re.sub(r"/+$", "", base_url)
+    base = _TRAIL_SLASH_RE.sub("", base_url)
     url0 = f"{base}/taxpayers/{rfc}/invoices"
 
     qs_base = {
@@ -144,7 +359,7 @@ def list_invoices_headers_api(
         "issuedAt[before]": f"{date_to:%Y-%m-%d}T23:59:59Z",
     }
 
-    sess = session or _make_session()
+    sess = session or shared_session()
     headers = {"X-API-Key": api_key}
 
     acc: List[Dict[str, Any]] = []
@@ -155,22 +370,7 @@ def list_invoices_headers_api(
         if next_id_lt:
             qs["id[lt]"] = next_id_lt
 
-        try:
-            resp = sess.get(url0, headers=headers, params=qs, timeout=35)
-            _set_api_mon(True, resp.status_code, resp.url)
-        except Exception:
-            _set_api_mon(False, None, url0)
-            break
-
-        if not (200 <= resp.status_code < 300):
-            break
-
-        try:
-            j = resp.json()
-        except Exception:
-            break
-
-        rows = j.get("hydra:member")
+        rows = _get_invoice_page(sess, base, url0, headers, qs)
         if not rows:
             break
         if isinstance(rows, dict):
@@ -201,72 +401,66 @@ def list_invoices_headers_api(
     if not acc:
         return pd.DataFrame()
 
-    # ---- Normalizar campos clave (same keys & fallbacks as R)
-    norm_rows: List[Dict[str, Any]] = []
+    h = _api_header_frame(acc)
 
-    for it in acc:
-        if not isinstance(it, dict):
-            continue
+    # ---- Filtros ESTRICTOS p/ “proveedores”
+    if h.empty:
+        return h
 
-        uuid = _safe_get(it, "uuid", "id", "@id", "invoiceId", "documentId")
-        issued = _safe_get(it, "issuedAt", "issueDate", "date", "createdAt")
-        fecha = None
-        if issued:
-            try:
-                fecha = datetime.fromisoformat(str(issued)[:10]).date()
-            except Exception:
-                fecha = None
+    return _filter_proveedores(h, rfc)
 
-        def _num(x: Any) -> Optional[float]:
-            try:
-                if x is None:
-                    return None
-                return float(str(x).replace(",", ""))
-            except Exception:
-                return None
 
-        total = _num(_safe_get(it, "total", "totalAmount", "amount_total", "grandTotal", "importe_total"))
-        moneda = _safe_get(it, "currency", "moneda")
-        tipo_cambio = _num(_safe_get(it, "exchangeRate", "tipoCambio", "tipo_cambio"))
-        metodo = _safe_get(it, "paymentMethod", "paymentType", "metodoPago")
-        tipo = _safe_get(it, "type", "tipoDeComprobante", "tipo_de_comprobante")
-
-        emisor_rfc = _safe_get_nested(it, ["issuer", "rfc"]) or _safe_get(it, "issuer.rfc", "emitter.rfc", "issuer_tax_id")
-        emisor_nombre = _safe_get_nested(it, ["issuer", "name"]) or _safe_get(it, "issuer.name", "emitter.name")
-        receptor_rfc = _safe_get_nested(it, ["receiver", "rfc"]) or _safe_get(it, "receiver.rfc", "receiver_tax_id")
-        receptor_nombre = _safe_get_nested(it, ["receiver", "name"]) or _safe_get(it, "receiver.name")
-
-        norm_rows.append(
-            {
-                "uuid": (str(uuid) if uuid is not None else None),
-                "fecha": fecha,
-                "total": total,
-                "moneda": (str(moneda).upper() if moneda is not None else None),
-                "tipo_cambio": tipo_cambio,
-                "metodo": (re.sub(r"\s+", "", str(metodo)).upper() if metodo is not None else None),
-                "tipo": (re.sub(r"\s+", "", str(tipo)).upper() if tipo is not None else None),
-                "emisor_rfc": (str(emisor_rfc).upper() if emisor_rfc is not None else None),
-                "emisor_nombre": (str(emisor_nombre) if emisor_nombre is not None else None),
-                "receptor_rfc": (str(receptor_rfc).upper() if receptor_rfc is not None else None),
-                "receptor_nombre": (str(receptor_nombre) if receptor_nombre is not None else None),
-            }
+def list_invoices_headers_api_parallel(
+    base_url: str,
+    api_key: str,
+    rfc: str,
+    date_from: date,
+    date_to: date,
+    shards: int = 8,
+    items_per_page: int = 1000,
+    max_pages: int = 400,
+    session: Optional[requests.Session] = None,
+) -> pd.DataFrame:
+    """
+    Same result as list_invoices_headers_api, but the date range is split into
+    `shards` contiguous day ranges that paginate concurrently (the id[lt] cursor
+    only chains pages inside one range).
+    """
+    n_days = (date_to - date_from).days + 1
+    shards = max(1, min(shards, n_days))
+    sess = session or shared_session()
+
+    if shards == 1:
+        return list_invoices_headers_api(
+            base_url, api_key, rfc, date_from, date_to,
+            items_per_page=items_per_page, max_pages=max_pages, session=sess,
         )
 
-    h = pd.DataFrame(norm_rows)
-
-    # ---- Filtros ESTRICTOS p/ “proveedores”
-    if h.empty:
-        return h
+    ranges: List[Tuple[date, date]] = []
+    for k in range(shards):
+        a = date_from + timedelta(days=(k * n_days) // shards)
+        b = date_from + timedelta(days=((k + 1) * n_days) // shards - 1)
+        ranges.append((a, b))
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=shards) as ex:
+        futs = [
+            ex.submit(
+                list_invoices_headers_api, base_url, api_key, rfc, a, b,
+                items_per_page=items_per_page, max_pages=max_pages, session=sess,
+            )
+            for a, b in ranges
+        ]
+        frames = [f.result() for f in futs]
 
-    rfc_u = rfc.upper()
-    h = h[
-        (h["uuid"].notna()) & (h["uuid"].astype(str) != "")
-        & (h["receptor_rfc"].fillna("").str.upper() == rfc_u)
-        & (h["emisor_rfc"].fillna("").str.upper() != rfc_u)
-        & (h["tipo"].fillna("").str.upper() == "I")
-    ].drop_duplicates(subset=["uuid"], keep="first")
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return pd.DataFrame()
 
-    return h.reset_index(drop=True)
+    # shards have different category sets, so concat yields object columns again
+    h = pd.concat(frames, ignore_index=True).drop_duplicates(subset=["uuid"], keep="first")
+    return _categorize(h.reset_index(drop=True))
 
 
 # =========================================================
@@ -284,7 +478,7 @@ def syntage_list_invoices_ids(
     session: Optional[requests.Session] = None,
 ) -> List[Dict[str, Any]]:
     # Mirrors R; returns raw list items
-    base = re.sub(r"/+$", "", base_url)
+    base = _TRAIL_SLASH_RE.sub("", base_url)
     url0 = f"{base}/taxpayers/{rfc}/invoices"
     qs_base = {
         "itemsPerPage": min(items_per_page, 1000),
@@ -293,7 +487,7 @@ def syntage_list_invoices_ids(
         "issuedAt[before]": f"{date_to:%Y-%m-%d}T23:59:59Z",
     }
 
-    sess = session or _make_session()
+    sess = session or shared_session()
     headers = {"X-API-Key": api_key}
 
     acc: List[Dict[str, Any]] = []
@@ -304,22 +498,7 @@ def syntage_list_invoices_ids(
         if next_id_lt:
             qs["id[lt]"] = next_id_lt
 
-        try:
-            resp = sess.get(url0, headers=headers, params=qs, timeout=35)
-            _set_api_mon(True, resp.status_code, resp.url)
-        except Exception:
-            _set_api_mon(False, None, url0)
-            break
-
-        if not (200 <= resp.status_code < 300):
-            break
-
-        try:
-            j = resp.json()
-        except Exception:
-            break
-
-        rows = j.get("hydra:member")
+        rows = _get_invoice_page(sess, base, url0, headers, qs)
         if not rows:
             break
         if isinstance(rows, dict):
@@ -350,46 +529,76 @@ def syntage_list_invoices_ids(
     return acc
 
 
-def cfdi_url_candidates(base_url: str, it: Dict[str, Any]) -> List[str]:
-    base = re.sub(r"/+$", "", base_url)
-    cands: List[str] = []
-
-    id_at = it.get("@id")
-    if isinstance(id_at, list):
-        id_at = id_at[0] if id_at else None
-    if id_at:
-        p = str(id_at)
-        if p:
-            if not p.startswith("/"):
-                p = "/" + p
-            cands.append(f"{base}{p}/cfdi")
-
-    for f in ("uuid", "invoiceId", "documentId", "id"):
-        v = it.get(f)
-        if isinstance(v, list):
-            v = v[0] if v else None
-        if v:
-            vv = str(v)
-            if vv:
-                cands.append(f"{base}/invoices/{vv}/cfdi")
+_CFDI_ID_FIELDS = ("@id", "uuid", "invoiceId", "documentId", "id")
+
+# base_url -> item field whose /cfdi URL answered the first probe
+_CFDI_TEMPLATE_CACHE: Dict[str, str] = {}
+
+
+def _cfdi_url_for(base: str, field: str, it: Dict[str, Any]) -> Optional[str]:
+    v = it.get(field)
+    if isinstance(v, list):
+        v = v[0] if v else None
+    if not v:
+        return None
+    p = str(v)
+    if not p:
+        return None
+    if field == "@id":
+        if not p.startswith("/"):
+            p = "/" + p
+        return f"{base}{p}/cfdi"
+    return f"{base}/invoices/{p}/cfdi"
+
 
+def _cfdi_urls_by_field(base_url: str, it: Dict[str, Any]) -> List[Tuple[str, str]]:
+    base = _TRAIL_SLASH_RE.sub("", base_url)
     # unique, keep order
     seen = set()
-    out: List[str] = []
-    for u in cands:
-        if u not in seen:
+    out: List[Tuple[str, str]] = []
+    for f in _CFDI_ID_FIELDS:
+        u = _cfdi_url_for(base, f, it)
+        if u and u not in seen:
             seen.add(u)
-            out.append(u)
+            out.append((f, u))
     return out
 
 
+def cfdi_url_candidates(base_url: str, it: Dict[str, Any]) -> List[str]:
+    return [u for _, u in _cfdi_urls_by_field(base_url, it)]
+
+
+def cfdi_url_from_template(base_url: str, template: str, it: Dict[str, Any]) -> Optional[str]:
+    """
+    Builds the /cfdi URL from the field learned by a previous probe (no network).
+    """
+    return _cfdi_url_for(_TRAIL_SLASH_RE.sub("", base_url), template, it)
+
+
+def _probe_cfdi_url(
+    base_url: str,
+    it: Dict[str, Any],
+    api_key: str,
+    session: Optional[requests.Session] = None,
+) -> Optional[str]:
+    """
+    Per-item probe; remembers which field worked so later items skip the HEADs.
+    """
+    by_field = _cfdi_urls_by_field(base_url, it)
+    u = probe_first_working_url([u for _, u in by_field], api_key, timeout_secs=8, session=session)
+    if u:
+        field = next(f for f, uu in by_field if uu == u)
+        _CFDI_TEMPLATE_CACHE.setdefault(_TRAIL_SLASH_RE.sub("", base_url), field)
+    return u
+
+
 def probe_first_working_url(
     urls: Iterable[str],
     api_key: str,
     timeout_secs: int = 8,
     session: Optional[requests.Session] = None,
 ) -> Optional[str]:
-    sess = session or _make_session()
+    sess = session or shared_session()
     headers = {"X-API-Key": api_key}
     for u in urls:
         try:
@@ -408,15 +617,14 @@ def http_get_xml_flex(
     api_key: str,
     timeout_secs: int = 15,
     session: Optional[requests.Session] = None,
-) -> Optional[str]:
-    sess = session or _make_session()
+) -> Optional[bytes]:
+    sess = session or shared_session()
     headers = {
         "X-API-Key": api_key,
         "Accept": "application/xml, text/xml;q=0.9, */*;q=0.5",
-        "User-Agent": "HayCash-Concentracion/1.0",
     }
     try:
-        resp = sess.get(url, headers=headers, timeout=timeout_secs)
+        resp = sess.get(url, headers=headers, timeout=(5, timeout_secs))
         _set_api_mon(True, resp.status_code, resp.url)
     except Exception:
         _set_api_mon(False, None, url)
@@ -424,72 +632,68 @@ def http_get_xml_flex(
 
     ct = resp.headers.get("content-type")
     if 200 <= resp.status_code < 300:
-        body = resp.text
-        if is_xml_ct(ct) or re.match(r"^\s*<\?xml", body or ""):
-            return body
+        # raw bytes straight to lxml (it honours the XML encoding declaration);
+        # no resp.text decode + re-encode round trip
+        content = resp.content or b""
+        if is_xml_ct(ct) or content[:64].lstrip().startswith(b"<?xml"):
+            return content
     return None
 
 
-def download_xmls_parallel(
-    urls: List[str],
-    api_key: str,
-    timeout_secs: int = 15,
-    parallel: bool = True,
-) -> List[str]:
-    # R optionally uses future.apply; we use threads (I/O bound).
-    sess = _make_session()
+_CFDI_HEADER_TAGS = frozenset(("TimbreFiscalDigital", "Comprobante", "Emisor", "Receptor"))
 
-    def _one(u: str) -> Optional[str]:
-        return http_get_xml_flex(u, api_key, timeout_secs=timeout_secs, session=sess)
 
-    if not parallel or len(urls) <= 1:
-        out = [_one(u) for u in urls]
-        return [x for x in out if x]
+def _cfdi_header_attrs(xml_bytes: bytes) -> Dict[str, Dict[str, str]]:
+    """
+    One iterparse pass collecting the attributes of the first element with each
+    header local-name; stops as soon as all four are seen and clears finished
+    elements on the way (no DOM retained, no XPath engine).
+    """
+    found: Dict[str, Dict[str, str]] = {}
+    for ev, el in etree.iterparse(BytesIO(xml_bytes), events=("start", "end"), huge_tree=False):
+        if ev == "end":
+            el.clear()
+            continue
+        name = el.tag.rpartition("}")[2] if isinstance(el.tag, str) else ""
+        if name in _CFDI_HEADER_TAGS and name not in found:
+            found[name] = dict(el.attrib)
+            if len(found) == len(_CFDI_HEADER_TAGS):
+                break
+    return found
 
-    from concurrent.futures import ThreadPoolExecutor, as_completed
 
-    out: List[str] = []
-    with ThreadPoolExecutor(max_workers=min(16, max(4, len(urls)))) as ex:
-        futs = {ex.submit(_one, u): u for u in urls}
-        for f in as_completed(futs):
-            try:
-                v = f.result()
-                if v:
-                    out.append(v)
-            except Exception:
-                continue
-    return out
+_HEADER_COLS = [
+    "uuid", "tipo", "metodo", "fecha", "total", "moneda", "tipo_cambio",
+    "emisor_rfc", "emisor_nombre", "receptor_rfc", "receptor_nombre",
+]
 
 
-def parse_header_min(xml_raw: str) -> pd.DataFrame:
+def parse_header_min_dict(xml_raw: bytes | str) -> Optional[Dict[str, Any]]:
+    if isinstance(xml_raw, str):
+        xml_raw = xml_raw.encode("utf-8", errors="ignore")
     try:
-        doc = etree.fromstring(xml_raw.encode("utf-8", errors="ignore"))
+        found = _cfdi_header_attrs(xml_raw)
     except Exception:
-        return pd.DataFrame()
+        return None
 
-    def a1(xpath: str, attr: str) -> Optional[str]:
-        try:
-            node = doc.xpath(xpath)
-            if not node:
-                return None
-            # xpath returns list of elements
-            n0 = node[0]
-            if isinstance(n0, etree._Element):
-                return n0.get(attr)
-            return None
-        except Exception:
-            return None
+    tfd = found.get("TimbreFiscalDigital")
+    comp = found.get("Comprobante")
+    emi = found.get("Emisor")
+    rec = found.get("Receptor")
+
+    def a1(el: Optional[Dict[str, str]], attr: str) -> Optional[str]:
+        return el.get(attr) if el is not None else None
 
     def up(x: Optional[str]) -> str:
-        return re.sub(r"\s+", "", (x or "")).upper()
+        return _WS_RE.sub("", (x or "")).upper()
 
-    uuid = a1("//*[local-name()='TimbreFiscalDigital']", "UUID")
-    tipo = up(a1("//*[local-name()='Comprobante']", "TipoDeComprobante"))
+    uuid = a1(tfd, "UUID")
+    tipo = up(a1(comp, "TipoDeComprobante"))
     if tipo not in {"I", "E", "P", "N", "T"}:
         tipo = None
 
-    metodo = up(a1("//*[local-name()='Comprobante']", "MetodoPago"))
-    fecha_s = a1("//*[local-name()='Comprobante']", "Fecha") or ""
+    metodo = up(a1(comp, "MetodoPago"))
+    fecha_s = a1(comp, "Fecha") or ""
     fecha = None
     try:
         fecha = datetime.fromisoformat(fecha_s[:10]).date()
@@ -504,76 +708,243 @@ def parse_header_min(xml_raw: str) -> pd.DataFrame:
         except Exception:
             return None
 
-    total = _num_attr(a1("//*[local-name()='Comprobante']", "Total"))
-    moneda = up(a1("//*[local-name()='Comprobante']", "Moneda"))
-    tipo_cambio = _num_attr(a1("//*[local-name()='Comprobante']", "TipoCambio"))
-    emisor_rfc = up(a1("//*[local-name()='Emisor']", "Rfc"))
-    emisor_nombre = a1("//*[local-name()='Emisor']", "Nombre")
-    receptor_rfc = up(a1("//*[local-name()='Receptor']", "Rfc"))
-    receptor_nombre = a1("//*[local-name()='Receptor']", "Nombre")
+    total = _num_attr(a1(comp, "Total"))
+    moneda = up(a1(comp, "Moneda"))
+    tipo_cambio = _num_attr(a1(comp, "TipoCambio"))
+    emisor_rfc = up(a1(emi, "Rfc"))
+    emisor_nombre = a1(emi, "Nombre")
+    receptor_rfc = up(a1(rec, "Rfc"))
+    receptor_nombre = a1(rec, "Nombre")
+
+    return {
+        "uuid": uuid,
+        "tipo": tipo,
+        "metodo": metodo,
+        "fecha": fecha,
+        "total": total,
+        "moneda": moneda,
+        "tipo_cambio": tipo_cambio,
+        "emisor_rfc": emisor_rfc,
+        "emisor_nombre": emisor_nombre,
+        "receptor_rfc": receptor_rfc,
+        "receptor_nombre": receptor_nombre,
+    }
 
-    return pd.DataFrame(
-        [
-            {
-                "uuid": uuid,
-                "tipo": tipo,
-                "metodo": metodo,
-                "fecha": fecha,
-                "total": total,
-                "moneda": moneda,
-                "tipo_cambio": tipo_cambio,
-                "emisor_rfc": emisor_rfc,
-                "emisor_nombre": emisor_nombre,
-                "receptor_rfc": receptor_rfc,
-                "receptor_nombre": receptor_nombre,
-            }
-        ]
-    )
+
+def parse_header_min(xml_raw: bytes | str) -> pd.DataFrame:
+    # one-row frame kept for callers of the original API
+    r = parse_header_min_dict(xml_raw)
+    return pd.DataFrame([r]) if r else pd.DataFrame()
 
 
-def headers_from_xml(base_url: str, api_key: str, rfc: str, dfrom: date, dto: date) -> pd.DataFrame:
+def headers_from_xml(
+    base_url: str,
+    api_key: str,
+    rfc: str,
+    dfrom: date,
+    dto: date,
+    trust_at_id: bool = True,
+) -> pd.DataFrame:
+    """
+    trust_at_id: GET {base}{@id}/cfdi directly (no HEAD probe) until a probe has
+    learned a pattern for this base_url; a failed GET still falls back to probing
+    every candidate.
+    """
     items = syntage_list_invoices_ids(base_url, api_key, rfc, dfrom, dto)
     if not items:
         return pd.DataFrame()
 
-    sess = _make_session()
-    urls: List[str] = []
-    for it in items:
-        cands = cfdi_url_candidates(base_url, it)
-        u = probe_first_working_url(cands, api_key, timeout_secs=8, session=sess)
+    sess = shared_session()
+    base = _TRAIL_SLASH_RE.sub("", base_url)
+
+    def _one(it: Dict[str, Any]) -> Optional[bytes]:
+        # discovery + download fused per item; the learned template skips the
+        # HEADs, and a failed templated GET falls back to the full probe
+        tmpl = _CFDI_TEMPLATE_CACHE.get(base) or ("@id" if trust_at_id else None)
+        u = cfdi_url_from_template(base, tmpl, it) if tmpl else None
         if u:
-            urls.append(u)
+            x = http_get_xml_flex(u, api_key, timeout_secs=15, session=sess)
+            if x:
+                return x
+        u2 = _probe_cfdi_url(base, it, api_key, session=sess)
+        if not u2 or u2 == u:
+            return None
+        return http_get_xml_flex(u2, api_key, timeout_secs=15, session=sess)
 
-    urls = [u for u in urls if u]
-    if not urls:
-        return pd.DataFrame()
+    from concurrent.futures import ThreadPoolExecutor, as_completed
 
-    xmls = download_xmls_parallel(urls, api_key, parallel=True, timeout_secs=15)
-    xmls = [x for x in xmls if x]
+    xmls: List[bytes] = []
+    with ThreadPoolExecutor(max_workers=min(_xml_workers(), len(items))) as ex:
+        futs = [ex.submit(_one, it) for it in items]
+        for f in as_completed(futs):
+            try:
+                v = f.result()
+                if v:
+                    xmls.append(v)
+            except Exception:
+                continue
     if not xmls:
         return pd.DataFrame()
 
-    frames = [parse_header_min(x) for x in xmls]
-    h = pd.concat([f for f in frames if not f.empty], ignore_index=True) if frames else pd.DataFrame()
+    # one frame built from plain dicts instead of concatenating N one-row frames
+    rows = [r for r in map(parse_header_min_dict, xmls) if r]
+    h = pd.DataFrame.from_records(rows, columns=_HEADER_COLS) if rows else pd.DataFrame()
 
     if h.empty:
         return h
 
-    rfc_u = rfc.upper()
-    h = h[
-        (h["uuid"].notna()) & (h["uuid"].astype(str) != "")
-        & (h["tipo"].fillna("").str.upper() == "I")
-        & (h["receptor_rfc"].fillna("").str.upper() == rfc_u)
-        & (h["emisor_rfc"].fillna("").str.upper() != rfc_u)
-    ].drop_duplicates(subset=["uuid"], keep="first")
+    return _filter_proveedores(h, rfc)
+
 
-    return h.reset_index(drop=True)
+# Everything metrics_by_interval reads from a header frame
+HEADER_ONLY_FIELDS = frozenset(
+    ("uuid", "tipo", "metodo", "fecha", "total", "moneda", "tipo_cambio",
+     "emisor_rfc", "emisor_nombre", "receptor_rfc", "receptor_nombre")
+)
+
+# Columns list_invoices_headers_api builds (same names as the XML header)
+_API_HEADER_FIELDS = frozenset(_HEADER_COLS)
+
+# Fields the proveedor filters and metrics cannot do without: the API must
+# fill them on every invoice before the XML source is rerouted to it.
+# (tipo_cambio, names, metodo may legitimately be empty on either path.)
+_API_REQUIRED_FIELDS = frozenset(("uuid", "fecha", "total", "tipo", "emisor_rfc", "receptor_rfc"))
+
+# (base_url, required fields) -> whether the API's invoice pages fill them
+_API_FIELDS_OK: Dict[Tuple[str, frozenset], bool] = {}
+
+
+def _api_returns_all(
+    fields: Iterable[str],
+    base_url: str,
+    api_key: str,
+    rfc: str,
+    date_from: date,
+    date_to: date,
+    session: Optional[requests.Session] = None,
+) -> Optional[bool]:
+    """
+    Probe: does the API actually return populated `fields` for this server?
+    Reads the first invoices page of `rfc` and checks that every required
+    field is non-null on all of its rows. None when the page gives no
+    evidence (HTTP error, no invoices); only a real answer is kept, per
+    base_url and field set.
+    """
+    fields = frozenset(fields)
+    if not fields <= _API_HEADER_FIELDS:
+        return False
+    needed = fields & _API_REQUIRED_FIELDS
+    if not needed:
+        return True
+
+    base = _TRAIL_SLASH_RE.sub("", base_url)
+    key = (base, needed)
+    if key not in _API_FIELDS_OK:
+        qs = {
+            "itemsPerPage": 100,
+            "isIssuer": "false",
+            "issuedAt[after]": f"{date_from:%Y-%m-%d}T00:00:00Z",
+            "issuedAt[before]": f"{date_to:%Y-%m-%d}T23:59:59Z",
+        }
+        rows = _get_invoice_page(
+            session or shared_session(), base, f"{base}/taxpayers/{rfc}/invoices", {"X-API-Key": api_key}, qs
+        )
+        if isinstance(rows, dict):
+            rows = [rows]
+        if not rows:
+            return None
+        h = _api_header_frame(rows)
+        if h.empty:
+            return None
+        _API_FIELDS_OK[key] = bool(h[sorted(needed)].notna().all().all())
+
+    return _API_FIELDS_OK[key]
+
+
+def resolve_source(
+    source: str,
+    base_url: str,
+    api_key: str,
+    rfcs: Iterable[str],
+    date_from: date,
+    date_to: date,
+    fields: Iterable[str] = HEADER_ONLY_FIELDS,
+    prefer_api: Optional[bool] = None,
+    session: Optional[requests.Session] = None,
+) -> str:
+    """
+    "xml" costs a list call + one GET (and parse) per invoice; when the API
+    is probed to return every field needed (_api_returns_all, first RFC with
+    invoices decides), use the single paginated API path instead. Without a
+    positive probe the source stays as chosen.
+    prefer_api=None reads HAYCASH_PREFER_API (default on; "0" keeps XML).
+    """
+    if source != "xml":
+        return source
+    if prefer_api is None:
+        prefer_api = os.getenv("HAYCASH_PREFER_API", "1") != "0"
+    if not prefer_api or not api_key:
+        return source
+    for rfc in rfcs:
+        ok = _api_returns_all(fields, base_url, api_key, rfc, date_from, date_to, session=session)
+        if ok is not None:
+            return "api" if ok else source
+    return source
 
 
 # =========================================================
 # Métricas por intervalo (proveedores + participación)
 # =========================================================
 
+def prepare_headers(h: pd.DataFrame, rfc_target: str) -> pd.DataFrame:
+    """
+    Interval-independent part of metrics_by_interval, done once per RFC:
+    proveedor filters, type coercion, monto_mxn and the emisor_nombre fallback.
+    metrics_by_interval then only applies the date window and groups.
+    """
+    if h is None or h.empty or "monto_mxn" in h.columns:
+        return h
+
+    # Ensure types consistent (h itself is never copied or mutated)
+    if "fecha" in h.columns:
+        fecha = pd.to_datetime(h["fecha"], errors="coerce").dt.date
+    else:
+        fecha = pd.Series(pd.NaT, index=h.index)
+
+    rfc_u = rfc_target.upper()
+
+    mask = (
+        fecha.notna()
+        & h["emisor_rfc"].notna()
+        & h["receptor_rfc"].notna()
+        # header builders already upper-case these (and store them as categories)
+        & (h["receptor_rfc"] == rfc_u)
+        & (h["emisor_rfc"] != rfc_u)
+        & (h["tipo"] == "I")
+    )
+
+    tipo_cambio = pd.to_numeric(h.loc[mask, "tipo_cambio"], errors="coerce")
+    total = pd.to_numeric(h.loc[mask, "total"], errors="coerce")
+
+    # monto_mxn logic matches case_when in R (NA currency counts as MXN)
+    mon = h.loc[mask, "moneda"]
+    is_mxn = (mon.isna() | mon.isin(["MXN", "NAN"])).to_numpy()
+    fx = tipo_cambio.to_numpy(dtype="float64", na_value=np.nan)
+    tot = total.to_numpy(dtype="float64", na_value=np.nan)
+    with np.errstate(invalid="ignore"):
+        fx_ok = np.isfinite(fx) & (fx > 0)
+    monto_mxn = np.where(is_mxn, tot, np.where(fx_ok, tot * fx, np.nan))
+
+    hh = h.loc[mask]
+    return hh.assign(
+        fecha=fecha[mask],
+        tipo_cambio=tipo_cambio,
+        total=total,
+        monto_mxn=monto_mxn,
+        emisor_nombre=hh["emisor_nombre"].where(hh["emisor_nombre"].notna(), hh["emisor_rfc"]),
+    )
+
+
 def metrics_by_interval(
     h: pd.DataFrame,
     interval_name: str,
@@ -582,56 +953,22 @@ def metrics_by_interval(
     rfc_target: str,
     excluir_fx_desconocido: bool = True,
 ) -> Optional[pd.DataFrame]:
+    """
+    h: raw headers or, cheaper when called for several intervals, the output of
+    prepare_headers(h, rfc_target).
+    """
     if h is None or h.empty:
         return None
 
-    hh = h.copy()
-
-    # Ensure types consistent
-    if "fecha" in hh.columns:
-        hh["fecha"] = pd.to_datetime(hh["fecha"], errors="coerce").dt.date
-    else:
-        hh["fecha"] = pd.NaT
-
-    rfc_u = rfc_target.upper()
-
-    hh = hh[
-        hh["fecha"].notna()
-        & (hh["fecha"] >= start_date)
-        & (hh["fecha"] <= end_date)
-        & hh["emisor_rfc"].notna()
-        & hh["receptor_rfc"].notna()
-        & (hh["receptor_rfc"].astype(str).str.upper() == rfc_u)
-        & (hh["emisor_rfc"].astype(str).str.upper() != rfc_u)
-        & (hh["tipo"].fillna("").astype(str).str.upper() == "I")
-    ].copy()
-
-    if hh.empty:
+    hp = prepare_headers(h, rfc_target)
+    if hp.empty:
         return None
 
-    hh["moneda"] = hh.get("moneda", pd.Series([None]*len(hh))).astype(str).str.upper()
-    hh["metodo"] = hh.get("metodo", pd.Series([None]*len(hh))).astype(str).str.upper()
-    hh["tipo_cambio"] = pd.to_numeric(hh.get("tipo_cambio"), errors="coerce")
-    hh["total"] = pd.to_numeric(hh.get("total"), errors="coerce")
-
-    # monto_mxn logic matches case_when in R
-    monto_mxn = []
-    for mon, fx, tot in zip(hh["moneda"], hh["tipo_cambio"], hh["total"]):
-        if pd.isna(tot):
-            monto_mxn.append(None)
-            continue
-        if (mon is None) or (str(mon).upper() == "MXN") or (str(mon).strip() == "NAN"):
-            monto_mxn.append(float(tot))
-        elif pd.notna(fx) and float(fx) > 0 and pd.isfinite(fx):
-            monto_mxn.append(float(tot) * float(fx))
-        else:
-            monto_mxn.append(None)
-    hh["monto_mxn"] = pd.to_numeric(pd.Series(monto_mxn), errors="coerce")
-
+    fecha = hp["fecha"]
+    keep = (fecha >= start_date) & (fecha <= end_date)
     if excluir_fx_desconocido:
-        hh = hh[hh["monto_mxn"].notna()].copy()
-
-    if hh.empty:
+        keep &= hp["monto_mxn"].notna()
+    if not keep.any():
         return None
 
     # columns
@@ -643,18 +980,28 @@ def metrics_by_interval(
     ct_pue = f"Conteo facturas PUE ({interval_name})"
     monto_pue = f"Monto facturado PUE ({interval_name})"
 
-    hh["emisor_nombre"] = hh["emisor_nombre"].where(hh["emisor_nombre"].notna(), hh["emisor_rfc"])
+    # masked columns so every aggregation is a built-in (Cython) reducer
+    hh = hp[keep]
+    is_ppd = (hh["metodo"] == "PPD").to_numpy()
+    is_pue = (hh["metodo"] == "PUE").to_numpy()
+    monto = hh["monto_mxn"].to_numpy()
+    hh = hh.assign(
+        _is_ppd=is_ppd.astype("int64"),
+        _is_pue=is_pue.astype("int64"),
+        _monto_ppd=np.where(is_ppd, monto, 0.0),
+        _monto_pue=np.where(is_pue, monto, 0.0),
+    )
 
-    grp = hh.groupby(["emisor_rfc", "emisor_nombre"], dropna=False)
+    grp = hh.groupby(["emisor_rfc", "emisor_nombre"], dropna=False, observed=True)
 
     agg = grp.agg(
         **{
             ct_total: ("uuid", "count"),
             monto_col: ("monto_mxn", "sum"),
-            ct_ppd: ("metodo", lambda s: int((s == "PPD").sum())),
-            monto_ppd: ("monto_mxn", lambda s: float(s[hh.loc[s.index, "metodo"] == "PPD"].sum())),
-            ct_pue: ("metodo", lambda s: int((s == "PUE").sum())),
-            monto_pue: ("monto_mxn", lambda s: float(s[hh.loc[s.index, "metodo"] == "PUE"].sum())),
+            ct_ppd: ("_is_ppd", "sum"),
+            monto_ppd: ("_monto_ppd", "sum"),
+            ct_pue: ("_is_pue", "sum"),
+            monto_pue: ("_monto_pue", "sum"),
         }
     ).reset_index()
 
@@ -668,6 +1015,19 @@ def metrics_by_interval(
 # Excel: tabla con encabezados agrupados por intervalo
 # =========================================================
 
+def _register_table_styles(wb: Workbook, border: Border) -> None:
+    existing = set(wb.named_styles)
+    top = Alignment(vertical="top")
+    for name, fmt in (
+        ("hc_cell", "General"),
+        ("hc_pct", "0.00%"),
+        ("hc_money", u'"$"#,##0.00'),
+        ("hc_int", "0"),
+    ):
+        if name not in existing:
+            wb.add_named_style(NamedStyle(name=name, number_format=fmt, border=border, alignment=top))
+
+
 def write_grouped_table(
     wb: Workbook,
     sheet_name: str,
@@ -774,27 +1134,37 @@ def write_grouped_table(
         cell.alignment = align_center
         cell.border = border
 
-    # Data rows
-    for i, (_, row) in enumerate(df2.iterrows(), start=0):
-        for j, col in enumerate(df2.columns, start=1):
-            val = row[col]
-            cell = ws.cell(row=r_data + i, column=j, value=None if pd.isna(val) else val)
-            cell.border = border
-            # formatting
-            if isinstance(val, (int, float)) and ("Participación" in col):
-                cell.number_format = "0.00%"
-            elif isinstance(val, (int, float)) and ("Monto" in col):
-                cell.number_format = u'"$"#,##0.00'
-            elif isinstance(val, (int, float)) and ("Conteo" in col):
-                cell.number_format = "0"
-            cell.alignment = Alignment(vertical="top")
+    # Data rows: bulk ws.append, then one shared named style per cell
+    # (styles are registered once per workbook instead of rebuilt per cell)
+    _register_table_styles(wb, border)
+
+    def col_style(col: str) -> Optional[str]:
+        if "Participación" in col:
+            return "hc_pct"
+        if "Monto" in col:
+            return "hc_money"
+        if "Conteo" in col:
+            return "hc_int"
+        return None
+
+    num_styles = [col_style(col) for col in df2.columns]
+    ncols = len(df2.columns)
+    for i, vals in enumerate(df2.itertuples(index=False, name=None)):
+        ws.append([None if pd.isna(v) else v for v in vals])
+        cells = next(ws.iter_rows(min_row=r_data + i, max_row=r_data + i, max_col=ncols))
+        for cell, val, num_style in zip(cells, vals, num_styles):
+            if num_style and isinstance(val, (int, float)):
+                cell.style = num_style
+            else:
+                cell.style = "hc_cell"
 
     # Freeze panes at header
     ws.freeze_panes = ws.cell(row=r_data, column=1)
 
-    # Auto width (basic)
+    # Auto width (basic): one vectorized length pass over the first 200 rows
+    widths = df2.head(200).astype("string").apply(lambda c: c.str.len().max()).fillna(0).astype(int)
     for j, col in enumerate(df2.columns, start=1):
-        max_len = max([len(str(col))] + [len(str(x)) for x in df2[col].head(200).astype(str).tolist()])
+        max_len = max(len(str(col)), int(widths[col]))
         ws.column_dimensions[get_column_letter(j)].width = min(55, max(10, max_len + 2))
 
 
@@ -805,25 +1175,39 @@ def build_excel_for_rfcs(
     source: str,
     intervals: List[str],
     excluir_fx: bool,
+    prefer_api: Optional[bool] = None,
+    fetch_headers: Optional[Callable[[str, date, date], pd.DataFrame]] = None,
 ) -> bytes:
     """
     Mirrors the Shiny downloadHandler: 1 sheet per RFC, info header, grouped table at row 5.
+    fetch_headers(rfc, dfrom, dto) replaces the direct Syntage fetch (e.g. a cached one).
     """
     wb = Workbook()
     # Remove default sheet
     wb.remove(wb.active)
 
     max_days = max(INTERVAL_DEFS[i] for i in intervals) if intervals else 365
+    dto = today_utc()
+    dfrom = dto - timedelta(days=max_days)
+    source = resolve_source(source, base_url, api_key, rfcs, dfrom, dto, prefer_api=prefer_api)
 
-    for rfc in rfcs:
-        dto = today_utc()
-        dfrom = dto - timedelta(days=max_days)
-
+    def _fetch_headers_for_rfc(rfc: str) -> pd.DataFrame:
+        if fetch_headers is not None:
+            return fetch_headers(rfc, dfrom, dto)
         if source == "api":
-            h = list_invoices_headers_api(base_url, api_key, rfc, dfrom, dto)
-        else:
-            h = headers_from_xml(base_url, api_key, rfc, dfrom, dto)
+            return list_invoices_headers_api_parallel(base_url, api_key, rfc, dfrom, dto)
+        return headers_from_xml(base_url, api_key, rfc, dfrom, dto)
+
+    # Fetch every RFC concurrently (network-bound, shared keep-alive session);
+    # the workbook is still written serially below since openpyxl isn't thread-safe.
+    # XML fetches already run their own pool, so fewer RFCs overlap there.
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = max(1, min(8 if source == "api" else 2, len(rfcs)))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        headers_by_rfc = list(ex.map(_fetch_headers_for_rfc, rfcs))
 
+    for rfc, h in zip(rfcs, headers_by_rfc):
         sheet_name = rfc[:31]
         wb.create_sheet(sheet_name)
         ws = wb[sheet_name]
@@ -837,11 +1221,12 @@ def build_excel_for_rfcs(
             ws.cell(row=5, column=1, value="Sin datos para los intervalos seleccionados.")
             continue
 
+        hp = prepare_headers(h, rfc)
         blocks: List[pd.DataFrame] = []
         for lbl in intervals:
             days_back = INTERVAL_DEFS[lbl]
             start = dto - timedelta(days=days_back)
-            b = metrics_by_interval(h, lbl, start, dto, rfc, excluir_fx_desconocido=excluir_fx)
+            b = metrics_by_interval(hp, lbl, start, dto, rfc, excluir_fx_desconocido=excluir_fx)
             if b is not None and not b.empty:
                 blocks.append(b)
 
@@ -883,7 +1268,6 @@ def build_excel_for_rfcs(
         write_grouped_table(wb, sheet_name, out, intervals, start_row=5)
 
     # Serialize to bytes
-    from io import BytesIO
     bio = BytesIO()
     wb.save(bio)
     return bio.getvalue()
@@ -8,21 +8,25 @@ if str(_APP_DIR) not in sys.path:
 # ---------------------------------------------------------------------------
 
 
-import re
+import threading
 
 import streamlit as st
 import pandas as pd
 from datetime import timedelta
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 from factoraje_logic import (
     INTERVAL_DEFS,
-    is_rfc,
+    parse_rfc_list,
     today_utc,
-    list_invoices_headers_api,
+    list_invoices_headers_api_parallel,
     headers_from_xml,
     metrics_by_interval,
+    prepare_headers,
     build_excel_for_rfcs,
     get_api_mon,
+    resolve_source,
+    shared_session,
 )
 
 st.set_page_config(page_title="Factoraje - Proveedores por intervalo", layout="wide")
@@ -46,15 +50,8 @@ with st.sidebar:
 
 base_url = "https://api.sandbox.syntage.com" if environment == "sandbox" else "https://api.syntage.com"
 
-# Parse RFCs
-raw = rfcs_text or ""
-parts = [p.strip().upper() for p in re.split(r"[\s,;\n\r]+", raw) if p.strip()]
-rfcs = []
-for p in parts:
-    p2 = re.sub(r"[^A-Z0-9]", "", p)
-    if is_rfc(p2):
-        if p2 not in rfcs:
-            rfcs.append(p2)
+# Parse RFCs (patterns compiled once in factoraje_logic, not on every rerun)
+rfcs = parse_rfc_list(rfcs_text or "")
 
 if not api_key:
     import os
@@ -67,11 +64,37 @@ if mon.get("last_status") is not None:
 else:
     st.caption("Aún sin llamadas a Syntage en esta sesión.")
 
-def get_headers(src_key: str, rfc: str, dfrom, dto):
-    if src_key == "api":
-        return list_invoices_headers_api(base_url, api_key, rfc, dfrom, dto)
+@st.cache_resource
+def get_session():
+    return shared_session()
+
+@st.cache_data(ttl=1800, show_spinner=False)
+def _cached_headers(src_key: str, base_url: str, api_key: str, rfc: str, dfrom, dto, _session=None):
+    # keyed on the key too, so one user's results are never served to another
+    # (_session is not part of the key: leading underscore)
+    if resolve_source(src_key, base_url, api_key, [rfc], dfrom, dto, session=_session) == "api":
+        return list_invoices_headers_api_parallel(base_url, api_key, rfc, dfrom, dto, session=_session)
     return headers_from_xml(base_url, api_key, rfc, dfrom, dto)
 
+def get_headers(src_key: str, rfc: str, dfrom, dto):
+    return _cached_headers(src_key, base_url, api_key, rfc, dfrom, dto, _session=get_session())
+
+def _worker_get_headers():
+    """
+    get_headers for build_excel_for_rfcs' worker threads: the session is
+    resolved here in the script thread, and each worker gets this run's
+    ScriptRunContext so st.cache_data works there without "missing
+    ScriptRunContext" warnings.
+    """
+    ctx = get_script_run_ctx()
+    session = get_session()
+
+    def run(rfc, dfrom, dto):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return _cached_headers(source_key, base_url, api_key, rfc, dfrom, dto, _session=session)
+
+    return run
+
 # Preview
 if preview_btn:
     if not rfcs:
@@ -85,6 +108,8 @@ if preview_btn:
         max_days = max(INTERVAL_DEFS[i] for i in intervals)
         dto = today_utc()
         dfrom = dto - timedelta(days=max_days)
+        if resolve_source(source_key, base_url, api_key, [rfc], dfrom, dto, session=get_session()) != source_key:
+            st.caption("Fuente XML: la API regresa los campos necesarios, se usa API (HAYCASH_PREFER_API=0 para forzar XML).")
 
         with st.spinner(f"Calculando para RFC {rfc}…"):
             h = get_headers(source_key, rfc, dfrom, dto)
@@ -92,11 +117,12 @@ if preview_btn:
         if h is None or h.empty:
             st.warning("Sin datos para el RFC / intervalos.")
         else:
+            hp = prepare_headers(h, rfc)
             blocks = []
             for lbl in intervals:
                 days_back = INTERVAL_DEFS[lbl]
                 start = dto - timedelta(days=days_back)
-                b = metrics_by_interval(h, lbl, start, dto, rfc, excluir_fx_desconocido=excluir_fx)
+                b = metrics_by_interval(hp, lbl, start, dto, rfc, excluir_fx_desconocido=excluir_fx)
                 if b is not None and not b.empty:
                     blocks.append(b)
 
@@ -146,6 +172,7 @@ if excel_btn:
                 source=source_key,
                 intervals=intervals,
                 excluir_fx=excluir_fx,
+                fetch_headers=_worker_get_headers(),
             )
         st.download_button(
             "Descargar Excel",
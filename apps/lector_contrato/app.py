@@ -19,278 +19,71 @@ Notes:
 
 from __future__ import annotations
 
-import os
-import re
-from dataclasses import dataclass
-from io import BytesIO
+# --- bootstrap so local imports (contrato_logic.py) work on Streamlit Cloud ---
+import sys
 from pathlib import Path
-from typing import List, Optional, Tuple
-
-import pandas as pd
-import streamlit as st
 
-try:
-    import pypdfium2 as pdfium
-except Exception as e:
-    pdfium = None  # handled later
+_APP_DIR = Path(__file__).resolve().parent
+if str(_APP_DIR) not in sys.path:
+    sys.path.insert(0, str(_APP_DIR))
+# ---------------------------------------------------------------------------
 
-try:
-    from PIL import Image
-except Exception:
-    Image = None
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
 
-try:
-    import pytesseract
-except Exception:
-    pytesseract = None
+# Tesseract uses OpenMP; ~4 threads per process scales well, one per core
+# in every worker process oversubscribes the machine.
+os.environ.setdefault("OMP_THREAD_LIMIT", "4")
 
+from concurrent.futures import ProcessPoolExecutor
 
-# -----------------------------
-# Config / constants
-# -----------------------------
-
-MONEY_REGEX = re.compile(r"\$\s*\d{1,3}(?:[ ,]\d{3})*(?:\.\d{2})?", re.IGNORECASE)
-PCT_REGEX = re.compile(r"\b\d{1,3}(?:\.\d+)?\s*%\b", re.IGNORECASE)
-
-ANCHOR_CAPITAL = re.compile(
-    r"HayCash\s+se\s+obliga\s+a\s+transferir|cantidad\s+de\s+\$|\(\s*el\s+[“\"]Anticipo[”\"]\s*\)|\bel\s+[“\"]Anticipo[”\"]\b",
-    re.IGNORECASE,
-)
-ANCHOR_PAGARE = re.compile(
-    r"se\s+obliga\s+a\s+devolver\s+a\s+HayCash|devolver\s+a\s+HayCash\s+la\s+suma\s+de|\(\s*la\s+[“\"]Devoluci[oó]n[”\"]\s*\)|\bel\s+[“\"]Devoluci[oó]n[”\"]\b",
-    re.IGNORECASE,
-)
-ANCHOR_CPA = re.compile(r"comisi[oó]n\s+por\s+apertura|comisi[oó]n\s+de\s+apertura", re.IGNORECASE)
+import pandas as pd
+import streamlit as st
 
-ANCHOR_MONTO_MINIMO_MENSUAL = re.compile(
-    r"\(\s*el\s+[“\"]?Monto\s+M[ií]nimo\s+Mensual[”\"]?\s*\)", re.IGNORECASE
+from contrato_logic import (
+    build_excel_bytes,
+    empty_row,
+    extract_fields_from_pdf_bytes,
+    init_ocr_worker,
+    ocr_available,
+    results_frame,
 )
 
 
-# -----------------------------
-# Helpers (ported from R)
-# -----------------------------
-
-def normalize_text(pages: List[str]) -> str:
-    """
-    R version:
-      paste(pages, collapse = "\n") %>% tolower() %>%
-      str_replace_all("\r", " ") %>% str_replace_all("[[:space:]]+", " ") %>% str_squish()
+class _FieldsCache:
     """
-    text = "\n".join([p or "" for p in pages])
-    text = text.replace("\r", " ")
-    text = text.lower()
-    # normalize whitespace
-    text = re.sub(r"\s+", " ", text, flags=re.UNICODE).strip()
-    return text
-
-
-def money_to_num(x: Optional[str]) -> Optional[float]:
-    if not x or (isinstance(x, float) and pd.isna(x)):
-        return None
-    s = str(x)
-    s = re.sub(r"[$\s]", "", s)
-    s = s.replace(",", "")
-    # allow "1 234" thousands
-    s = s.replace(" ", "")
-    try:
-        return float(s)
-    except Exception:
-        return None
-
-
-def pct_to_num(x: Optional[str]) -> Optional[float]:
-    if not x or (isinstance(x, float) and pd.isna(x)):
-        return None
-    s = str(x).replace("%", "").strip()
-    try:
-        return float(s)
-    except Exception:
-        return None
-
-
-@dataclass
-class Hit:
-    start: int
-    end: int
-    value: str
-
-
-def extract_all_with_pos(text: str, pattern: re.Pattern) -> List[Hit]:
-    hits: List[Hit] = []
-    for m in pattern.finditer(text):
-        hits.append(Hit(start=m.start(), end=m.end(), value=m.group(0)))
-    return hits
-
-
-def _window_around_anchor(text: str, anchor_span: Tuple[int, int], window: int) -> Tuple[str, int]:
+    Extracted rows by (sha256 of the PDF, file name), least recently used
+    dropped past `max_entries`. Shared by every session, hence the lock.
     """
-    Returns (chunk, start_offset_in_original)
-    """
-    a_start, a_end = anchor_span
-    start = max(0, a_start - window)
-    end = min(len(text), a_end + window)
-    return text[start:end], start
-
-
-def extract_money_near(text: str, anchor_regex: re.Pattern, window: int = 1200, prefer: str = "nearest") -> Tuple[Optional[str], Optional[str]]:
-    a = anchor_regex.search(text)
-    if not a:
-        return None, None
-
-    chunk, chunk_start = _window_around_anchor(text, (a.start(), a.end()), window)
-    hits = extract_all_with_pos(chunk, MONEY_REGEX)
-    if not hits:
-        return None, chunk
-
-    if prefer == "first":
-        pick = hits[0].value
-    elif prefer == "last":
-        pick = hits[-1].value
-    else:
-        anchor_center = (a.start() + a.end()) / 2
-        anchor_center_in_chunk = anchor_center - chunk_start
-        best = min(hits, key=lambda h: abs(((h.start + h.end) / 2) - anchor_center_in_chunk))
-        pick = best.value
-
-    return pick.strip(), chunk
-
-
-def extract_pct_near(text: str, anchor_regex: re.Pattern, window: int = 900, prefer: str = "nearest") -> Tuple[Optional[str], Optional[str]]:
-    a = anchor_regex.search(text)
-    if not a:
-        return None, None
-
-    chunk, chunk_start = _window_around_anchor(text, (a.start(), a.end()), window)
-    hits = extract_all_with_pos(chunk, PCT_REGEX)
-    if not hits:
-        return None, chunk
-
-    if prefer == "first":
-        pick = hits[0].value
-    elif prefer == "last":
-        pick = hits[-1].value
-    else:
-        anchor_center = (a.start() + a.end()) / 2
-        anchor_center_in_chunk = anchor_center - chunk_start
-        best = min(hits, key=lambda h: abs(((h.start + h.end) / 2) - anchor_center_in_chunk))
-        pick = best.value
-
-    return pick.strip(), chunk
 
+    def __init__(self, max_entries: int):
+        self._rows: OrderedDict = OrderedDict()
+        self._max = max_entries
+        self._lock = threading.Lock()
 
-def extract_money_just_before_monto_minimo_mensual(text: str, window: int = 2400) -> Tuple[Optional[str], Optional[str]]:
-    a = ANCHOR_MONTO_MINIMO_MENSUAL.search(text)
-    if not a:
-        return None, None
+    def get(self, key):
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None:
+                self._rows.move_to_end(key)
+            return row
 
-    end = a.start()
-    start = max(0, end - window)
-    chunk = text[start:end]
+    def put(self, key, row: dict) -> None:
+        with self._lock:
+            self._rows[key] = row
+            self._rows.move_to_end(key)
+            while len(self._rows) > self._max:
+                self._rows.popitem(last=False)
 
-    hits = extract_all_with_pos(chunk, MONEY_REGEX)
-    if not hits:
-        return None, chunk
 
-    return hits[-1].value.strip(), chunk
-
-
-# -----------------------------
-# PDF reading (text + OCR fallback)
-# -----------------------------
-
-def _configure_tesseract_from_env() -> None:
-    """
-    If user sets $env:TESSERACT_CMD in PowerShell, we pick it up.
-    """
-    if pytesseract is None:
-        return
-    cmd = os.getenv("TESSERACT_CMD") or os.getenv("TESSERACT_PATH")
-    if cmd and os.path.exists(cmd):
-        pytesseract.pytesseract.tesseract_cmd = cmd
-
-
-def pdf_text_pages(pdf_path: str, ocr_if_empty: bool = True, ocr_lang: str = "spa") -> List[str]:
-    """
-    Extract embedded text per page via PDFium.
-    If text is mostly empty and OCR is available, OCR each page image.
-    """
-    if pdfium is None:
-        raise RuntimeError("pypdfium2 is not installed or failed to import.")
-
-    _configure_tesseract_from_env()
-
-    doc = pdfium.PdfDocument(pdf_path)
-    pages_text: List[str] = []
-
-    for i in range(len(doc)):
-        page = doc[i]
-        try:
-            textpage = page.get_textpage()
-            txt = textpage.get_text_range()
-        except Exception:
-            txt = ""
-        pages_text.append(txt or "")
-
-    joined = normalize_text(pages_text)
-    if not ocr_if_empty:
-        return pages_text
-
-    # If embedded text is very small, try OCR (requires pytesseract + PIL + installed tesseract)
-    if len(joined) < 200:
-        if pytesseract is None or Image is None:
-            return pages_text
-
-        ocr_pages: List[str] = []
-        for i in range(len(doc)):
-            page = doc[i]
-            try:
-                # render at higher scale for OCR
-                pil_image = page.render(scale=2).to_pil()
-                ocr_txt = pytesseract.image_to_string(pil_image, lang=ocr_lang)
-            except Exception:
-                ocr_txt = ""
-            ocr_pages.append(ocr_txt or "")
-        return ocr_pages
-
-    return pages_text
-
-
-# -----------------------------
-# Main extractor
-# -----------------------------
-
-def extract_fields_from_pdf(pdf_path: str) -> dict:
-    pages = pdf_text_pages(pdf_path, ocr_if_empty=True, ocr_lang="spa")
-    text = normalize_text(pages)
-
-    cap_raw, _ = extract_money_near(text, ANCHOR_CAPITAL, window=1200, prefer="nearest")
-    pag_raw, _ = extract_money_near(text, ANCHOR_PAGARE, window=1400, prefer="nearest")
-    cpa_raw, _ = extract_pct_near(text, ANCHOR_CPA, window=900, prefer="nearest")
-    mp_raw, _ = extract_money_just_before_monto_minimo_mensual(text, window=2400)
-
-    return {
-        "file_name": Path(pdf_path).name,
-        "file_path": str(Path(pdf_path).resolve()),
-        "capital_raw": cap_raw,
-        "capital": money_to_num(cap_raw),
-        "valor_pagare_raw": pag_raw,
-        "valor_pagare": money_to_num(pag_raw),
-        "cpa_raw": cpa_raw,
-        "cpa": pct_to_num(cpa_raw),
-        "min_payment_raw": mp_raw,
-        "min_payment": money_to_num(mp_raw),
-    }
-
-
-def build_excel_bytes(df: pd.DataFrame) -> bytes:
-    """
-    Writes an XLSX in-memory. Requires openpyxl.
-    """
-    out = BytesIO()
-    with pd.ExcelWriter(out, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="extraccion")
-    return out.getvalue()
+@st.cache_resource
+def _fields_cache() -> _FieldsCache:
+    """Re-uploading the same contract skips PDFium and OCR entirely."""
+    return _FieldsCache(max_entries=500)
 
 
 # -----------------------------
@@ -330,32 +123,56 @@ if run:
     else:
         rows = []
         errors = 0
-        # Save uploads to a temp folder so pdfium can open them
-        tmp_dir = Path(st.session_state.get("tmp_dir", str(Path.cwd() / "_tmp_uploads")))
-        tmp_dir.mkdir(parents=True, exist_ok=True)
-        st.session_state["tmp_dir"] = str(tmp_dir)
 
+        # PDFium reads the uploads straight from memory: no temp files
+        cache = _fields_cache()
+        items = []
         for uf in uploaded:
-            try:
-                tmp_path = tmp_dir / uf.name
-                tmp_path.write_bytes(uf.getbuffer())
-                rows.append(extract_fields_from_pdf(str(tmp_path)))
-            except Exception:
-                errors += 1
-                rows.append({
-                    "file_name": uf.name,
-                    "file_path": "",
-                    "capital_raw": None,
-                    "capital": None,
-                    "valor_pagare_raw": None,
-                    "valor_pagare": None,
-                    "cpa_raw": None,
-                    "cpa": None,
-                    "min_payment_raw": None,
-                    "min_payment": None,
-                })
-
-        df = pd.DataFrame(rows)
+            data = uf.getvalue()
+            items.append((uf.name, (hashlib.sha256(data).hexdigest(), uf.name), data))
+
+        # PDFs are independent and CPU-bound (PDFium + OCR): one process per
+        # file up to the core count; a single PDF skips the pool start-up.
+        # With OCR each worker may run OMP_THREAD_LIMIT Tesseract threads, so
+        # the pool shrinks to cores // that.
+        cached = {}
+        for _, key, _ in items:
+            row = cache.get(key)
+            if row is not None:
+                cached[key] = row
+        todo = {key: (data, name) for name, key, data in items if key not in cached}
+        omp_threads = os.environ["OMP_THREAD_LIMIT"]
+        slots = os.cpu_count() or 1
+        if ocr_available() and omp_threads.isdigit() and int(omp_threads) > 1:
+            slots = max(1, slots // int(omp_threads))
+        # spawn, not the default fork: forking the multi-threaded Streamlit
+        # server can copy a lock held by another thread into the child
+        workers = min(slots, len(todo))
+        pool = (
+            ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_ocr_worker,
+                initargs=(omp_threads,),
+            )
+            if workers > 1
+            else contextlib.nullcontext()
+        )
+
+        with pool as ex:
+            futs = {key: ex.submit(extract_fields_from_pdf_bytes, *args) for key, args in todo.items()} if ex is not None else {}
+            for name, key, data in items:
+                try:
+                    if key not in cached:
+                        fut = futs.get(key)
+                        cached[key] = fut.result() if fut else extract_fields_from_pdf_bytes(data, name)
+                        cache.put(key, cached[key])
+                    rows.append(dict(cached[key]))
+                except Exception:
+                    errors += 1
+                    rows.append(empty_row(name))
+
+        df = results_frame(rows)
         st.session_state["results_df"] = df
 
         st.session_state["status"] = (
@@ -394,4 +211,4 @@ with col2:
                 use_container_width=True,
             )
         except Exception as e:
-            st.error("No se pudo generar el Excel. Instala openpyxl: pip install openpyxl")
+            st.error("No se pudo generar el Excel. Instala xlsxwriter u openpyxl: pip install xlsxwriter")
@@ -0,0 +1,509 @@
+# -*- coding: utf-8 -*-
+"""
+Extraction logic for the "Lector Contrato" app (no Streamlit imports), kept
+separate from app.py so worker processes can import it by module name.
+
+- PDF text via PDFium, OCR fallback with Tesseract
+- Anchor + nearest-value extraction for Capital, Valor pagaré, CPA, min_payment
+- Excel export
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import List, Optional, Tuple, Union
+
+import pandas as pd
+
+try:
+    import pypdfium2 as pdfium
+except Exception as e:
+    pdfium = None  # handled later
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+try:
+    import pytesseract
+except Exception:
+    pytesseract = None
+
+try:
+    import tesserocr  # optional: in-process Tesseract, no subprocess per run
+except ImportError:
+    tesserocr = None
+
+try:
+    import xlsxwriter  # optional: fast XLSX writer for build_excel_bytes
+except ImportError:
+    xlsxwriter = None
+
+try:
+    import regex as _rx  # optional: faster engine for the anchor/value scans
+except ImportError:
+    _rx = re
+
+
+# -----------------------------
+# Config / constants
+# -----------------------------
+
+# Anchor/value patterns run over the whole contract text. The `regex` engine
+# (when installed) is faster on these; possessive quantifiers stop backtracking
+# on near-miss amounts without changing what matches (every later part is optional).
+_POSSESSIVE = _rx is not re or sys.version_info >= (3, 11)
+
+MONEY_REGEX = _rx.compile(
+    r"\$\s*+\d{1,3}+(?:[ ,]\d{3})*+(?:\.\d{2})?+" if _POSSESSIVE
+    else r"\$\s*\d{1,3}(?:[ ,]\d{3})*(?:\.\d{2})?",
+    _rx.IGNORECASE,
+)
+PCT_REGEX = _rx.compile(
+    r"\b\d{1,3}(?:\.\d+)?+\s*+%\b" if _POSSESSIVE else r"\b\d{1,3}(?:\.\d+)?\s*%\b",
+    _rx.IGNORECASE,
+)
+
+ANCHOR_CAPITAL = _rx.compile(
+    r"HayCash\s+se\s+obliga\s+a\s+transferir|cantidad\s+de\s+\$|\(\s*el\s+[“\"]Anticipo[”\"]\s*\)|\bel\s+[“\"]Anticipo[”\"]\b",
+    _rx.IGNORECASE,
+)
+ANCHOR_PAGARE = _rx.compile(
+    r"se\s+obliga\s+a\s+devolver\s+a\s+HayCash|devolver\s+a\s+HayCash\s+la\s+suma\s+de|\(\s*la\s+[“\"]Devoluci[oó]n[”\"]\s*\)|\bel\s+[“\"]Devoluci[oó]n[”\"]\b",
+    _rx.IGNORECASE,
+)
+ANCHOR_CPA = _rx.compile(r"comisi[oó]n\s+por\s+apertura|comisi[oó]n\s+de\s+apertura", _rx.IGNORECASE)
+
+ANCHOR_MONTO_MINIMO_MENSUAL = _rx.compile(
+    r"\(\s*el\s+[“\"]?Monto\s+M[ií]nimo\s+Mensual[”\"]?\s*\)", _rx.IGNORECASE
+)
+
+
+# -----------------------------
+# Helpers (ported from R)
+# -----------------------------
+
+_WS_TABLE = {c: " " for c in range(0x3001) if chr(c).isspace()}
+_SPACE_RUN_RE = re.compile(" {2,}")
+
+
+def normalize_text(pages: List[str]) -> str:
+    """
+    R version:
+      paste(pages, collapse = "\n") %>% tolower() %>%
+      str_replace_all("\r", " ") %>% str_replace_all("[[:space:]]+", " ") %>% str_squish()
+    """
+    # every char re's \s matches (str.isspace, all below U+3001) becomes a
+    # plain space in one C-level pass; then only runs of spaces are collapsed
+    text = "\n".join([p or "" for p in pages]).translate(_WS_TABLE).lower()
+    return _SPACE_RUN_RE.sub(" ", text).strip()
+
+
+def money_to_num(x: Optional[str]) -> Optional[float]:
+    if not x or (isinstance(x, float) and pd.isna(x)):
+        return None
+    s = str(x)
+    s = re.sub(r"[$\s]", "", s)
+    s = s.replace(",", "")
+    # allow "1 234" thousands
+    s = s.replace(" ", "")
+    try:
+        return float(s)
+    except Exception:
+        return None
+
+
+def pct_to_num(x: Optional[str]) -> Optional[float]:
+    if not x or (isinstance(x, float) and pd.isna(x)):
+        return None
+    s = str(x).replace("%", "").strip()
+    try:
+        return float(s)
+    except Exception:
+        return None
+
+
+@dataclass
+class Hit:
+    start: int
+    end: int
+    value: str
+
+
+def _nearest_hit(hits: List[Hit], center: float) -> Hit:
+    """
+    Hit whose center is closest to `center`; on a tie the earlier one wins
+    (same as min() over the list). Hits come from finditer, so they do not
+    overlap and their centers are already sorted: binary search instead of
+    scanning them all.
+    """
+    centers = [(h.start + h.end) / 2 for h in hits]
+    i = bisect.bisect_left(centers, center)
+    if i == 0:
+        return hits[0]
+    if i == len(hits) or center - centers[i - 1] <= centers[i] - center:
+        return hits[i - 1]
+    return hits[i]
+
+
+# One pass over the text for all four anchors and both value kinds. Every
+# alternative sits inside a lookahead, so nothing is consumed: an anchor such
+# as "cantidad de $" and the amount that starts at its "$" are both reported.
+_FIELD_SCAN = _rx.compile(
+    "(?=(?:"
+    f"(?P<cap>{ANCHOR_CAPITAL.pattern})"
+    f"|(?P<pag>{ANCHOR_PAGARE.pattern})"
+    f"|(?P<cpa>{ANCHOR_CPA.pattern})"
+    f"|(?P<mmm>{ANCHOR_MONTO_MINIMO_MENSUAL.pattern})"
+    f"|(?P<money>{MONEY_REGEX.pattern})"
+    f"|(?P<pct>{PCT_REGEX.pattern})"
+    "))",
+    _rx.IGNORECASE,
+)
+
+
+def _hits_in_window(hits: List[Hit], starts: List[int], lo: int, hi: int) -> List[Hit]:
+    # hits are in document order; keep the ones fully inside [lo, hi)
+    i = bisect.bisect_left(starts, lo)
+    out: List[Hit] = []
+    for h in hits[i:]:
+        if h.start >= hi:
+            break
+        if h.end <= hi:
+            out.append(h)
+    return out
+
+
+def _nearest_in_window(
+    hits: List[Hit], starts: List[int], anchor: Optional[Tuple[int, int]], window: int, n: int
+) -> Optional[str]:
+    if anchor is None:
+        return None
+    a_start, a_end = anchor
+    cand = _hits_in_window(hits, starts, max(0, a_start - window), min(n, a_end + window))
+    if not cand:
+        return None
+    return _nearest_hit(cand, (a_start + a_end) / 2).value.strip()
+
+
+def extract_all_fields(text: str) -> dict:
+    """
+    The *_raw captures from a single _FIELD_SCAN pass: per anchor, the
+    amount (or percentage) nearest to it within the window; for
+    min_payment, the last amount before the "monto mínimo mensual" anchor.
+    """
+    anchors: dict = {}
+    values: dict = {"money": [], "pct": []}
+    for m in _FIELD_SCAN.finditer(text):
+        kind = m.lastgroup
+        start, end = m.span(kind)
+        if kind in values:
+            lst = values[kind]
+            # lookahead reports every start; keep finditer's non-overlapping hits
+            if not lst or start >= lst[-1].end:
+                lst.append(Hit(start=start, end=end, value=m.group(kind)))
+        elif kind not in anchors:
+            anchors[kind] = (start, end)
+
+    n = len(text)
+    money, pct = values["money"], values["pct"]
+    money_starts = [h.start for h in money]
+    pct_starts = [h.start for h in pct]
+
+    mp_raw = None
+    if "mmm" in anchors:
+        end = anchors["mmm"][0]
+        before = _hits_in_window(money, money_starts, max(0, end - 2400), end)
+        mp_raw = before[-1].value.strip() if before else None
+
+    return {
+        "capital_raw": _nearest_in_window(money, money_starts, anchors.get("cap"), 1200, n),
+        "valor_pagare_raw": _nearest_in_window(money, money_starts, anchors.get("pag"), 1400, n),
+        "cpa_raw": _nearest_in_window(pct, pct_starts, anchors.get("cpa"), 900, n),
+        "min_payment_raw": mp_raw,
+    }
+
+
+# -----------------------------
+# PDF reading (text + OCR fallback)
+# -----------------------------
+
+def _configure_tesseract_from_env() -> None:
+    """
+    If user sets $env:TESSERACT_CMD in PowerShell, we pick it up.
+    """
+    if pytesseract is None:
+        return
+    cmd = os.getenv("TESSERACT_CMD") or os.getenv("TESSERACT_PATH")
+    if cmd and os.path.exists(cmd):
+        pytesseract.pytesseract.tesseract_cmd = cmd
+
+
+def ocr_available() -> bool:
+    """True if pages without embedded text can be OCR'd in this environment."""
+    return Image is not None and (tesserocr is not None or pytesseract is not None)
+
+
+# Pages of one PDF OCR'd concurrently (Tesseract releases the GIL). Set to 1
+# in pool workers, where the pool already spreads files over the cores.
+_OCR_PAGE_THREADS = 4
+
+
+def init_ocr_worker(omp_threads: str) -> None:
+    """
+    ProcessPoolExecutor initializer: pin Tesseract's OpenMP threads in the
+    child so N workers do not each start one thread per core, and OCR pages
+    sequentially there.
+    """
+    global _OCR_PAGE_THREADS
+    os.environ["OMP_THREAD_LIMIT"] = omp_threads
+    _OCR_PAGE_THREADS = 1
+
+
+def _page_chunks(idx: List[int]) -> List[List[int]]:
+    """
+    Split page indices into contiguous chunks, one per OCR thread. Threads x
+    OMP_THREAD_LIMIT stays within the core count.
+    """
+    omp = os.getenv("OMP_THREAD_LIMIT", "")
+    per_thread = int(omp) if omp.isdigit() and int(omp) > 0 else 1
+    k = max(1, min(_OCR_PAGE_THREADS, len(idx), (os.cpu_count() or 1) // per_thread))
+    size = -(-len(idx) // k)
+    return [idx[n : n + size] for n in range(0, len(idx), size)]
+
+
+def _ocr_chunk_in_process(images: list, chunk: List[int], lang: str) -> List[str]:
+    """
+    OCR through libtesseract (tesserocr): the model is loaded once per thread
+    and each page is just SetImage + GetUTF8Text, no process start-up or PNG
+    encoding. An API handle is not thread-safe, so each chunk opens its own.
+    """
+    kwargs = {"lang": lang}
+    if os.getenv("TESSDATA_PREFIX"):
+        kwargs["path"] = os.environ["TESSDATA_PREFIX"]
+    texts = []
+    with tesserocr.PyTessBaseAPI(**kwargs) as api:
+        for i in chunk:
+            api.SetImage(images[i])
+            texts.append(api.GetUTF8Text() or "")
+    return texts
+
+
+def _ocr_chunk_cli(images: list, chunk: List[int], lang: str) -> List[str]:
+    """
+    ONE tesseract run for the chunk: the PNGs are listed in a text file and
+    tesseract separates page outputs with form feeds. Falls back to one call
+    per image if the batch run fails.
+    """
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i in chunk:
+                p = os.path.join(tmp, f"p{i:04d}.png")
+                images[i].save(p)
+                paths.append(p)
+            list_path = os.path.join(tmp, "list.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(paths) + "\n")
+            parts = pytesseract.image_to_string(list_path, lang=lang).split("\f")
+        if len(parts) >= len(chunk):
+            return [txt or "" for txt in parts[: len(chunk)]]
+    except Exception:
+        pass
+
+    texts = []
+    for i in chunk:
+        try:
+            texts.append(pytesseract.image_to_string(images[i], lang=lang) or "")
+        except Exception:
+            texts.append("")
+    return texts
+
+
+def _ocr_chunks(ocr_chunk, images: list, chunks: List[List[int]], lang: str) -> List[List[str]]:
+    if len(chunks) == 1:
+        return [ocr_chunk(images, chunks[0], lang)]
+    with ThreadPoolExecutor(max_workers=len(chunks)) as ex:
+        return list(ex.map(lambda c: ocr_chunk(images, c, lang), chunks))
+
+
+def ocr_images_batch(images: list, lang: str = "spa") -> List[str]:
+    """
+    OCR all page images, in-process with tesserocr when it is installed,
+    otherwise with one tesseract CLI run per chunk of pages. Chunks run in
+    parallel threads. None images yield "".
+    """
+    out = [""] * len(images)
+    idx = [i for i, im in enumerate(images) if im is not None]
+    if not idx:
+        return out
+
+    chunks = _page_chunks(idx)
+    results = None
+    if tesserocr is not None:
+        try:
+            results = _ocr_chunks(_ocr_chunk_in_process, images, chunks, lang)
+        except Exception:
+            pass  # e.g. language data not found by libtesseract: use the CLI
+    if results is None:
+        if pytesseract is None:
+            return out
+        results = _ocr_chunks(_ocr_chunk_cli, images, chunks, lang)
+
+    for chunk, texts in zip(chunks, results):
+        for i, txt in zip(chunk, texts):
+            out[i] = txt
+    return out
+
+
+def pdf_text_pages(
+    pdf: Union[str, bytes], ocr_if_empty: bool = True, ocr_lang: str = "spa", min_chars_per_page: int = 40
+) -> List[str]:
+    """
+    Extract embedded text per page via PDFium from a path or the PDF bytes.
+    Pages with less than `min_chars_per_page` characters of embedded text
+    (scans) are rendered and OCR'd if OCR is available; born-digital pages
+    keep their embedded text and never reach Tesseract.
+    """
+    if pdfium is None:
+        raise RuntimeError("pypdfium2 is not installed or failed to import.")
+
+    _configure_tesseract_from_env()
+
+    # OCR requires tesserocr, or pytesseract + PIL + installed tesseract
+    do_ocr = ocr_if_empty and ocr_available()
+
+    pages_text: List[str] = []
+    ocr_idx: List[int] = []
+    images = []
+
+    # One pass: text and (for scanned pages) the OCR render come from the same
+    # page object, and every PDFium handle is closed as soon as it is done.
+    doc = pdfium.PdfDocument(BytesIO(pdf) if isinstance(pdf, (bytes, bytearray)) else pdf)
+    try:
+        for i in range(len(doc)):
+            page = doc[i]
+            try:
+                try:
+                    textpage = page.get_textpage()
+                    try:
+                        txt = textpage.get_text_range() or ""
+                    finally:
+                        textpage.close()
+                except Exception:
+                    txt = ""
+                pages_text.append(txt)
+
+                if do_ocr and len(txt.strip()) < min_chars_per_page:
+                    ocr_idx.append(i)
+                    try:
+                        # render at higher scale for OCR
+                        images.append(page.render(scale=2).to_pil())
+                    except Exception:
+                        images.append(None)
+            finally:
+                page.close()
+    finally:
+        doc.close()
+
+    if not ocr_idx:
+        return pages_text
+
+    merged = list(pages_text)
+    for i, txt in zip(ocr_idx, ocr_images_batch(images, lang=ocr_lang)):
+        if txt.strip():
+            merged[i] = txt
+    return merged
+
+
+# -----------------------------
+# Main extractor
+# -----------------------------
+
+RESULT_COLUMNS = [
+    "file_name",
+    "file_path",
+    "capital_raw",
+    "capital",
+    "valor_pagare_raw",
+    "valor_pagare",
+    "cpa_raw",
+    "cpa",
+    "min_payment_raw",
+    "min_payment",
+]
+
+# numeric column <- raw column
+_MONEY_FROM_RAW = {
+    "capital": "capital_raw",
+    "valor_pagare": "valor_pagare_raw",
+    "min_payment": "min_payment_raw",
+}
+
+
+def extract_fields_from_pdf_bytes(pdf_bytes: bytes, file_name: str) -> dict:
+    """
+    File name plus the *_raw captures for an in-memory PDF (e.g. an upload);
+    file_path is left empty. results_frame() adds the numbers.
+    """
+    pages = pdf_text_pages(pdf_bytes, ocr_if_empty=True, ocr_lang="spa")
+
+    return {
+        "file_name": file_name,
+        "file_path": "",
+        **extract_all_fields(normalize_text(pages)),
+    }
+
+
+def results_frame(rows: List[dict]) -> pd.DataFrame:
+    """
+    DataFrame of extracted rows with the numeric columns parsed from *_raw in
+    one vectorized pass per column (same results as money_to_num/pct_to_num).
+    """
+    df = pd.DataFrame(rows).reindex(columns=RESULT_COLUMNS)
+
+    def raw_strings(col: str) -> pd.Series:
+        return df[col].astype("object").where(df[col].notna(), None)
+
+    for col, raw_col in _MONEY_FROM_RAW.items():
+        cleaned = raw_strings(raw_col).str.replace(r"[$\s,]", "", regex=True)
+        df[col] = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+    cleaned = raw_strings("cpa_raw").str.replace("%", "", regex=False).str.strip()
+    df["cpa"] = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+    return df
+
+
+def build_excel_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Writes an XLSX in-memory with xlsxwriter (much faster than openpyxl's
+    pure-Python serializer); openpyxl is used only if xlsxwriter is missing.
+    """
+    # no constant_memory: pandas writes column by column, and that mode only
+    # keeps the row being written, so earlier rows would come out blank
+    engine = "xlsxwriter" if xlsxwriter is not None else "openpyxl"
+    out = BytesIO()
+    with pd.ExcelWriter(out, engine=engine) as writer:
+        df.to_excel(writer, index=False, sheet_name="extraccion")
+    return out.getvalue()
+
+
+def empty_row(file_name: str) -> dict:
+    """
+    Row used when a PDF fails to process (same keys as extract_fields_from_pdf_bytes).
+    """
+    return {
+        "file_name": file_name,
+        "file_path": "",
+        "capital_raw": None,
+        "valor_pagare_raw": None,
+        "cpa_raw": None,
+        "min_payment_raw": None,
+    }
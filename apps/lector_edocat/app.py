@@ -13,13 +13,20 @@ from __future__ import annotations
 import os
 import re
 import io
-from typing import Optional, Dict
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional, Dict
 
 import streamlit as st
 import pandas as pd
 from PIL import Image
 import pytesseract
 
+try:
+    import tesserocr  # optional: in-process Tesseract, no subprocess per run
+except ImportError:
+    tesserocr = None
+
 # PDF rendering (no poppler dependency)
 import pypdfium2 as pdfium
 
@@ -29,6 +36,12 @@ import pypdfium2 as pdfium
 # -----------------------------
 MAX_UPLOAD_MB = 30
 DEFAULT_LANG = "spa"
+# 200 DPI is enough for statement text; 300 only helps with small/ornate fonts
+DEFAULT_DPI = 200
+
+# Tesseract uses OpenMP; cap its threads so concurrent sessions/pages do not
+# each start one thread per core.
+os.environ.setdefault("OMP_THREAD_LIMIT", "4")
 
 # Optional: allow overriding where tesseract.exe is (Windows)
 # Set env var TESSERACT_CMD to the full path of tesseract.exe if it's not on PATH.
@@ -113,28 +126,17 @@ def _parse_money_from_match(s: str) -> Optional[float]:
     except ValueError:
         return None
 
-def extract_value(pattern: str, text: str) -> Optional[float]:
-    """
-    R equivalent:
-      m <- regexpr(patron, texto, perl=TRUE); match <- regmatches(...)
-      as.numeric(gsub("[^0-9.]", "", match))
-    Python:
-      search regex and then pull the first currency-like number.
-    """
-    m = re.search(pattern, text, flags=re.IGNORECASE | re.DOTALL)
-    if not m:
-        return None
-    return _parse_money_from_match(m.group(0))
-
 def money_fmt(x: Optional[float]) -> str:
     if x is None:
         return ""
     # mimic scales::dollar(prefix="$ ", big.mark=",")
     return f"$ {x:,.2f}"
 
-def render_pdf_to_images(pdf_bytes: bytes, dpi: int = 300) -> list[Image.Image]:
+def render_pdf_to_images(pdf_bytes: bytes, dpi: int = DEFAULT_DPI) -> list[Image.Image]:
     """
-    Render PDF pages to PIL Images using pypdfium2 (no poppler).
+    Render PDF pages to grayscale PIL Images using pypdfium2 (no poppler).
+    Tesseract binarizes anyway, so one 8-bit channel loses nothing and is a
+    third of the RGB data.
     """
     pdf = pdfium.PdfDocument(pdf_bytes)
     images: list[Image.Image] = []
@@ -142,35 +144,155 @@ def render_pdf_to_images(pdf_bytes: bytes, dpi: int = 300) -> list[Image.Image]:
         page = pdf[i]
         # scale ~ dpi/72
         scale = dpi / 72.0
-        pil_image = page.render(scale=scale).to_pil()
+        pil_image = page.render(scale=scale, grayscale=True).to_pil()
         images.append(pil_image)
     return images
 
-def ocr_images(images: list[Image.Image], lang: str = DEFAULT_LANG) -> str:
+def _page_chunks(n: int) -> list[range]:
+    """
+    Split n pages into contiguous chunks, one per OCR thread (at most 4).
+    Threads x OMP_THREAD_LIMIT stays within the core count.
+    """
+    omp = os.getenv("OMP_THREAD_LIMIT", "")
+    per_thread = int(omp) if omp.isdigit() and int(omp) > 0 else 1
+    k = max(1, min(4, n, (os.cpu_count() or 1) // per_thread))
+    size = -(-n // k)
+    return [range(a, min(a + size, n)) for a in range(0, n, size)]
+
+def _ocr_chunk_in_process(images: list[Image.Image], lang: str) -> list[str]:
+    """
+    OCR through libtesseract (tesserocr): the model is loaded once per thread
+    and each page is just SetImage + GetUTF8Text.
+    """
+    kwargs = {"lang": lang}
+    if os.getenv("TESSDATA_PREFIX"):
+        kwargs["path"] = os.environ["TESSDATA_PREFIX"]
+    with tesserocr.PyTessBaseAPI(**kwargs) as api:
+        parts = []
+        for img in images:
+            api.SetImage(img)
+            parts.append(api.GetUTF8Text() or "")
+    return parts
+
+def _ocr_chunk_cli(images: list[Image.Image], lang: str) -> list[str]:
+    """
+    ONE tesseract run for the chunk (image-list file, pages split on the form
+    feed tesseract emits) instead of one process + model load per page.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i, img in enumerate(images):
+            p = os.path.join(tmp, f"p{i:04d}.png")
+            img.save(p)
+            paths.append(p)
+        list_path = os.path.join(tmp, "list.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(paths) + "\n")
+        parts = pytesseract.image_to_string(list_path, lang=lang).split("\f")
+    if len(parts) < len(images):
+        # unexpected batch output: fall back to page by page
+        parts = [pytesseract.image_to_string(img, lang=lang) for img in images]
+    return parts[: len(images)]
+
+def _ocr_pages(ocr_chunk, images: list[Image.Image], lang: str, on_progress=None) -> list[str]:
+    # Tesseract releases the GIL, so page chunks OCR in parallel threads.
+    # on_progress(pages_done, total) runs in the calling thread, once per
+    # finished chunk (Streamlit elements can't be updated from the workers).
+    chunks = [[images[i] for i in r] for r in _page_chunks(len(images))]
+    if len(chunks) == 1:
+        parts = ocr_chunk(chunks[0], lang)
+        if on_progress:
+            on_progress(len(images), len(images))
+        return parts
+    results: list[list[str]] = [[] for _ in chunks]
+    done = 0
+    with ThreadPoolExecutor(max_workers=len(chunks)) as ex:
+        futs = {ex.submit(ocr_chunk, c, lang): k for k, c in enumerate(chunks)}
+        for fut in as_completed(futs):
+            k = futs[fut]
+            results[k] = fut.result()
+            done += len(chunks[k])
+            if on_progress:
+                on_progress(done, len(images))
+    return [txt for part in results for txt in part]
+
+def ocr_images(
+    images: list[Image.Image],
+    lang: str = DEFAULT_LANG,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> str:
     """
     OCR each image and concatenate with the same separator used in the R script.
+    Uses tesserocr in-process when installed, otherwise the tesseract CLI.
+    on_progress(pages_done, total) is called as page chunks finish.
     """
-    parts: list[str] = []
-    for img in images:
-        parts.append(pytesseract.image_to_string(img, lang=lang))
+    if not images:
+        return ""
+    parts = None
+    if tesserocr is not None:
+        try:
+            parts = _ocr_pages(_ocr_chunk_in_process, images, lang, on_progress)
+        except Exception:
+            pass  # e.g. language data not found by libtesseract: use the CLI
+    if parts is None:
+        parts = _ocr_pages(_ocr_chunk_cli, images, lang, on_progress)
     return "\n\n--- Página siguiente ---\n\n".join(parts)
 
+# Same patterns as the R script.
+SUMMARY_PATTERNS = {
+    "Saldo_Inicial": r"Saldo Inicial.*?\$ ?[0-9,.]+",
+    "Depositos": r"Dep[oó]sitos.*?\$ ?[0-9,.]+",
+    "Retiros": r"Retiros.*?\$ ?[0-9,.]+",
+    "Saldo_Final": r"Saldo Final.*?\$ ?[0-9,.]+",
+    "Saldo_Promedio": r"Saldo Promedio.*?\$ ?[0-9,.]+",
+    "Interes_Mensual": r"Inter[eé]s Nominal en el Mes.*?\$ ?[0-9,.]+",
+    "ISR_Mensual": r"ISR Retenido en el Mes.*?\$ ?[0-9,.]+",
+}
+
+# All labels in one scan. Each alternative is a lookahead, so a match that
+# runs past the next label does not consume it: the first hit per group is
+# exactly what a separate re.search with that pattern would return.
+SUMMARY_RE = re.compile(
+    "|".join(f"(?=(?P<{k}>{v}))" for k, v in SUMMARY_PATTERNS.items()),
+    flags=re.IGNORECASE | re.DOTALL,
+)
+
+def ocr_summary_first(
+    images: list[Image.Image],
+    lang: str = DEFAULT_LANG,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> str:
+    """
+    OCR only the top third of each page (where statements print the summary
+    block). If any summary value is missing from that text, OCR the full
+    pages instead (on_progress then starts over for that pass).
+    """
+    crops = [img.crop((0, 0, img.width, img.height // 3)) for img in images]
+    text = ocr_images(crops, lang=lang, on_progress=on_progress)
+    if all(v is not None for v in extract_summary(text).values()):
+        return text
+    return ocr_images(images, lang=lang, on_progress=on_progress)
+
+def extract_summary(text: str) -> Dict[str, Optional[float]]:
+    """
+    Summary values (None where a label was not found) from one SUMMARY_RE scan.
+    """
+    row: Dict[str, Optional[float]] = dict.fromkeys(SUMMARY_PATTERNS)
+    found = set()
+    for m in SUMMARY_RE.finditer(text):
+        k = m.lastgroup
+        if k not in found:
+            found.add(k)
+            row[k] = _parse_money_from_match(m.group(k))
+            if len(found) == len(row):
+                break
+    return row
+
 def build_summary(text: str) -> pd.DataFrame:
     """
     Use same patterns as the R script.
     """
-    patterns = {
-        "Saldo_Inicial": r"Saldo Inicial.*?\$ ?[0-9,.]+",
-        "Depositos": r"Dep[oó]sitos.*?\$ ?[0-9,.]+",
-        "Retiros": r"Retiros.*?\$ ?[0-9,.]+",
-        "Saldo_Final": r"Saldo Final.*?\$ ?[0-9,.]+",
-        "Saldo_Promedio": r"Saldo Promedio.*?\$ ?[0-9,.]+",
-        "Interes_Mensual": r"Inter[eé]s Nominal en el Mes.*?\$ ?[0-9,.]+",
-        "ISR_Mensual": r"ISR Retenido en el Mes.*?\$ ?[0-9,.]+",
-    }
-
-    row: Dict[str, Optional[float]] = {k: extract_value(v, text) for k, v in patterns.items()}
-    df = pd.DataFrame([row])
+    df = pd.DataFrame([extract_summary(text)])
 
     # Format like the R code (it formatted only some columns; we format all numeric for clarity)
     for col in df.columns:
@@ -196,7 +318,20 @@ with left:
 
     uploaded = st.file_uploader("Selecciona tu archivo PDF", type=["pdf"], accept_multiple_files=False)
     lang = st.text_input("Idioma OCR (Tesseract)", value=DEFAULT_LANG, help="Ej: spa, eng. Requiere el traineddata correspondiente.")
-    dpi = st.number_input("DPI para renderizar el PDF", min_value=150, max_value=600, value=300, step=50)
+    dpi = st.number_input(
+        "DPI para renderizar el PDF",
+        min_value=150,
+        max_value=600,
+        value=DEFAULT_DPI,
+        step=50,
+        help="200 basta para la mayoría de los estados de cuenta; usa 300 solo si las letras son pequeñas u ornamentadas.",
+    )
+
+    summary_only = st.checkbox(
+        "Solo resumen (OCR del tercio superior de cada página)",
+        value=False,
+        help="Más rápido. Si falta algún valor del resumen, se procesa la página completa.",
+    )
 
     run = st.button("Procesar con OCR", type="primary")
 
@@ -241,25 +376,25 @@ if run:
             )
             st.stop()
 
-        prog = st.progress(0)
-        texts = []
-        total = len(images) if images else 1
-
-        for idx, img in enumerate(images, start=1):
-            prog.progress(int((idx - 1) / total * 100))
-            try:
-                texts.append(pytesseract.image_to_string(img, lang=lang))
-            except Exception as e:
-                st.session_state.processing = False
-                st.error(
-                    "Falló el OCR (Tesseract). Verifica instalación y que el idioma exista (spa.traineddata). "
-                    f"Error: {e}"
-                )
-                st.stop()
-
-        prog.progress(100)
-
-        st.session_state.ocr_text = "\n\n--- Página siguiente ---\n\n".join(texts)
+        prog = st.progress(0, text=f"OCR: 0/{len(images)} páginas")
+
+        def _on_progress(done: int, total: int) -> None:
+            prog.progress(done / total, text=f"OCR: {done}/{total} páginas")
+
+        try:
+            if summary_only:
+                ocr_text = ocr_summary_first(images, lang=lang, on_progress=_on_progress)
+            else:
+                ocr_text = ocr_images(images, lang=lang, on_progress=_on_progress)
+        except Exception as e:
+            st.session_state.processing = False
+            st.error(
+                "Falló el OCR (Tesseract). Verifica instalación y que el idioma exista (spa.traineddata). "
+                f"Error: {e}"
+            )
+            st.stop()
+
+        st.session_state.ocr_text = ocr_text
         st.session_state.processing = False
 
 # Show table if we have text
@@ -1,8 +1,14 @@
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import mysql.connector
+from mysql.connector import pooling
+import numpy as np
 import pandas as pd
 from datetime import datetime, date, timedelta
 from calendar import monthrange
-from decimal import Decimal  # para manejar bien los Decimals
 
 
 # ============================
@@ -17,10 +23,56 @@ DB_CONFIG = {
     "port": 63306,
 }
 
+# ============================
+# Conexiones
+# ============================
+# Un pool por proceso: cada reporte pide una conexión ya autenticada en vez
+# de pagar TCP + TLS + login contra RDS en cada cálculo. conn.close() la
+# regresa al pool; el pool la reconecta si el servidor la cerró.
+# Los cursores de mysql-connector ya son unbuffered por defecto (las filas se
+# leen del socket en fetchall) y todas las consultas regresan agregados de
+# decenas de filas: no hay nada que ganar con cursores del lado del servidor.
+
+# calcular_reporte() corre sus secciones en _SECCIONES hilos, cada uno con su
+# propia conexión: el pool alcanza para _SESIONES reportes a la vez (tope de
+# mysql-connector: 32) y sólo más allá de eso se abren conexiones directas.
+_SECCIONES = 5
+_SESIONES = 4
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_conn():
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = pooling.MySQLConnectionPool(pool_name="consejo", pool_size=_SECCIONES * _SESIONES, **DB_CONFIG)
+    try:
+        return _POOL.get_connection()
+    except mysql.connector.errors.PoolError:
+        # todas ocupadas (varias sesiones a la vez): conexión directa
+        return mysql.connector.connect(**DB_CONFIG)
+
+
+@contextmanager
+def _conn():
+    """
+    Conexión del pool para un bloque `with`; al salir regresa al pool.
+    """
+    conn = _get_conn()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
 # ============================
 # Utilidades de fechas
 # ============================
 
+@lru_cache(maxsize=32)
 def parse_fecha_ev(fecha_ev_str: str) -> date:
     """
     Acepta 'YYYY-MM' o 'YYYY-MM-DD' y regresa la fecha_ev como
@@ -60,22 +112,88 @@ def same_month_prev_year(any_date: date):
     return date(prev_year, any_date.month, last_day_prev)
 
 
+def mes_desde_ym(ym: pd.Series) -> pd.Series:
+    """
+    Convierte la llave entera de mes YEAR*100+MONTH (p. ej. 202503) que
+    regresan las consultas mensuales al texto 'YYYY-MM' del reporte.
+    """
+    ym = ym.astype("int64")
+    return (ym // 100).astype(str) + "-" + (ym % 100).astype(str).str.zfill(2)
+
+
 def calc_yoy(curr, prev):
     """
-    Devuelve crecimiento YoY en porcentaje como Decimal.
+    Devuelve crecimiento YoY en porcentaje como float.
     Maneja curr/prev como Decimal, int o float.
     """
-    if prev in (0, None) or curr is None:
+    if prev is None or curr is None:
         return None
 
-    curr_dec = curr if isinstance(curr, Decimal) else Decimal(str(curr))
-    prev_dec = prev if isinstance(prev, Decimal) else Decimal(str(prev))
-
-    if prev_dec == 0:
+    p = float(prev)
+    if p == 0:
         return None
 
     # 100 * (curr - prev) / prev  (regresamos el valor ya en "porcentaje")
-    return (Decimal(100) * (curr_dec - prev_dec) / prev_dec)
+    return 100.0 * (float(curr) - p) / p
+
+
+# ============================
+# SQL de métricas FINANCIEROS
+# ============================
+# Constantes a nivel de módulo con parámetros posicionales (%s): el cursor
+# preparado manda cada sentencia una vez y solo envía los valores, sin
+# interpolar ni escapar el SQL en cada llamada. Cada tabla se lee una sola
+# vez: las métricas que comparten tabla salen de SUM(CASE ...) en la misma
+# consulta. Los montos salen como DOUBLE (CAST ... AS DOUBLE) para que el
+# driver entregue float y no Decimal que luego se convierte celda por celda.
+
+# colocado desde el inicio, colocación del mes y del mismo mes del año
+# anterior, para capital y vp
+Q_COLOCACION = """
+    SELECT
+      CAST(COALESCE(SUM(CASE WHEN started_at <= %s THEN capital END), 0) AS DOUBLE),
+      CAST(COALESCE(SUM(CASE WHEN started_at <= %s THEN vp END), 0) AS DOUBLE),
+      CAST(COALESCE(SUM(CASE WHEN started_at >= %s AND started_at < %s THEN capital END), 0) AS DOUBLE),
+      CAST(COALESCE(SUM(CASE WHEN started_at >= %s AND started_at < %s THEN vp END), 0) AS DOUBLE),
+      CAST(COALESCE(SUM(CASE WHEN started_at >= %s AND started_at < %s THEN capital END), 0) AS DOUBLE),
+      CAST(COALESCE(SUM(CASE WHEN started_at >= %s AND started_at < %s THEN vp END), 0) AS DOUBLE)
+    FROM calculados.credits_details
+    WHERE started_at < %s
+"""
+
+# amortizado desde el inicio: capital_return (capital) y cobranza_total (vp)
+Q_AMORTIZADO = """
+    SELECT
+      (SELECT CAST(COALESCE(SUM(capital_return), 0) AS DOUBLE)
+       FROM calculados.credit_movements
+       WHERE period_ym <= %s),
+      (SELECT CAST(COALESCE(SUM(cobranza_total), 0) AS DOUBLE)
+       FROM calculados.RX_cobranza
+       WHERE Mes <= %s)
+"""
+
+Q_CARTERA_TOTAL = """
+    SELECT
+      CAST(COALESCE(SUM(due_capital_total), 0) AS DOUBLE),
+      CAST(COALESCE(SUM(due_vp_total), 0) AS DOUBLE)
+    FROM calculados.RX_cartera_historico
+    WHERE mes = %s
+"""
+
+# capital = saldo/gamma, vp = saldo; dias_atraso > 90
+Q_CARTERA_VENCIDA = """
+    SELECT
+      CAST(COALESCE(SUM(CASE WHEN gamma <> 0 THEN saldo / gamma ELSE 0 END), 0) AS DOUBLE),
+      CAST(COALESCE(SUM(saldo), 0) AS DOUBLE)
+    FROM calculados.tabla_v_total
+    WHERE date = %s
+      AND dias_atraso > 90
+"""
+
+
+def _fetch_row(cur, query: str, params: tuple):
+    cur.execute(query, params)
+    return cur.fetchone()
 
 
 # ============================
@@ -95,171 +213,45 @@ def calcular_metricas_financieras(fecha_ev_str: str):
     fecha_ev_prev = same_month_prev_year(fecha_ev)
     inicio_mes_prev, inicio_mes_prev_siguiente = month_bounds(fecha_ev_prev)
 
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    params = {
-        "fecha_ev": fecha_ev,
-        "inicio_mes": inicio_mes,
-        "inicio_mes_siguiente": inicio_mes_siguiente,
-        "fecha_ev_prev": fecha_ev_prev,
-        "inicio_mes_prev": inicio_mes_prev,
-        "inicio_mes_prev_siguiente": inicio_mes_prev_siguiente,
-        "period_ym": fecha_ev_ym,
-    }
-
-    # ---------- VALOR CAPITAL ----------
-
-    # 1) Monto colocado desde el inicio (capital)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(capital), 0)
-        FROM calculados.credits_details
-        WHERE started_at <= %(fecha_ev)s
-        """,
-        params,
-    )
-    capital_monto_colocado_desde_inicio = cur.fetchone()[0]
-
-    # 2) Monto amortizado desde el inicio (capital_return hasta fecha_ev)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(capital_return), 0)
-        FROM calculados.credit_movements
-        WHERE period_ym <= %(period_ym)s
-        """,
-        params,
-    )
-    capital_monto_amortizado_desde_inicio = cur.fetchone()[0]
-
-    # 3) Cartera total (due_capital_total en RX_cartera_historico en fecha_ev)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(due_capital_total), 0)
-        FROM calculados.RX_cartera_historico
-        WHERE mes = %(fecha_ev)s
-        """,
-        params,
-    )
-    capital_cartera_total = cur.fetchone()[0]
-
-    # 4) Cartera vencida (tabla_v_total.saldo/gamma con dias_atraso > 90 en fecha_ev)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(
-            CASE WHEN gamma <> 0 THEN saldo / gamma ELSE 0 END
-        ), 0)
-        FROM calculados.tabla_v_total
-        WHERE date = %(fecha_ev)s
-          AND dias_atraso > 90
-        """,
-        params,
-    )
-    capital_cartera_vencida = cur.fetchone()[0]
-
-    # 5) Colocación del mes (capital, started_at en mes de fecha_ev)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(capital), 0)
-        FROM calculados.credits_details
-        WHERE started_at >= %(inicio_mes)s
-          AND started_at < %(inicio_mes_siguiente)s
-        """,
-        params,
-    )
-    capital_colocacion_mes = cur.fetchone()[0]
-
-    # 6) Colocación del mes año anterior (capital, mismo mes año previo)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(capital), 0)
-        FROM calculados.credits_details
-        WHERE started_at >= %(inicio_mes_prev)s
-          AND started_at < %(inicio_mes_prev_siguiente)s
-        """,
-        params,
-    )
-    capital_colocacion_mes_prev = cur.fetchone()[0]
+    with _conn() as conn:
+        cur = conn.cursor(prepared=True)
+
+        # 1), 5), 6) Monto colocado desde el inicio y colocación del mes / mes año anterior
+        (
+            capital_monto_colocado_desde_inicio,
+            vp_monto_colocado_desde_inicio,
+            capital_colocacion_mes,
+            vp_colocacion_mes,
+            capital_colocacion_mes_prev,
+            vp_colocacion_mes_prev,
+        ) = _fetch_row(
+            cur,
+            Q_COLOCACION,
+            (
+                fecha_ev, fecha_ev,
+                inicio_mes, inicio_mes_siguiente, inicio_mes, inicio_mes_siguiente,
+                inicio_mes_prev, inicio_mes_prev_siguiente, inicio_mes_prev, inicio_mes_prev_siguiente,
+                # cota superior de todos los rangos anteriores
+                inicio_mes_siguiente,
+            ),
+        )
 
-    # 7) Crecimiento YoY colocación (capital)
-    capital_yoy = calc_yoy(capital_colocacion_mes, capital_colocacion_mes_prev)
+        # 2) Monto amortizado desde el inicio (capital_return / cobranza_total hasta fecha_ev)
+        capital_monto_amortizado_desde_inicio, vp_monto_amortizado_desde_inicio = _fetch_row(
+            cur, Q_AMORTIZADO, (fecha_ev_ym, fecha_ev)
+        )
 
-    # ---------- VALOR PAGARÉ ----------
+        # 3) Cartera total (due_capital_total / due_vp_total en RX_cartera_historico en fecha_ev)
+        capital_cartera_total, vp_cartera_total = _fetch_row(cur, Q_CARTERA_TOTAL, (fecha_ev,))
 
-    # 1) Monto colocado desde el inicio (vp)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(vp), 0)
-        FROM calculados.credits_details
-        WHERE started_at <= %(fecha_ev)s
-        """,
-        params,
-    )
-    vp_monto_colocado_desde_inicio = cur.fetchone()[0]
-
-    # 2) Monto amortizado desde el inicio (Valor pagaré)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(cobranza_total), 0)
-        FROM calculados.RX_cobranza
-        WHERE Mes <= %(fecha_ev)s
-        """,
-        params,
-    )
-    vp_monto_amortizado_desde_inicio = cur.fetchone()[0]
-
-    # 3) Cartera total (due_vp_total en RX_cartera_historico en fecha_ev)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(due_vp_total), 0)
-        FROM calculados.RX_cartera_historico
-        WHERE mes = %(fecha_ev)s
-        """,
-        params,
-    )
-    vp_cartera_total = cur.fetchone()[0]
-
-    # 4) Cartera vencida (tabla_v_total.saldo con dias_atraso > 90 en fecha_ev)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(saldo), 0)
-        FROM calculados.tabla_v_total
-        WHERE date = %(fecha_ev)s
-          AND dias_atraso > 90
-        """,
-        params,
-    )
-    vp_cartera_vencida = cur.fetchone()[0]
-
-    # 5) Colocación del mes (vp)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(vp), 0)
-        FROM calculados.credits_details
-        WHERE started_at >= %(inicio_mes)s
-          AND started_at < %(inicio_mes_siguiente)s
-        """,
-        params,
-    )
-    vp_colocacion_mes = cur.fetchone()[0]
-
-    # 6) Colocación del mes año anterior (vp)
-    cur.execute(
-        """
-        SELECT COALESCE(SUM(vp), 0)
-        FROM calculados.credits_details
-        WHERE started_at >= %(inicio_mes_prev)s
-          AND started_at < %(inicio_mes_prev_siguiente)s
-        """,
-        params,
-    )
-    vp_colocacion_mes_prev = cur.fetchone()[0]
+        # 4) Cartera vencida (tabla_v_total con dias_atraso > 90 en fecha_ev)
+        capital_cartera_vencida, vp_cartera_vencida = _fetch_row(cur, Q_CARTERA_VENCIDA, (fecha_ev,))
 
-    # 7) Crecimiento YoY colocación (vp)
-    vp_yoy = calc_yoy(vp_colocacion_mes, vp_colocacion_mes_prev)
+        # 7) Crecimiento YoY colocación
+        capital_yoy = calc_yoy(capital_colocacion_mes, capital_colocacion_mes_prev)
+        vp_yoy = calc_yoy(vp_colocacion_mes, vp_colocacion_mes_prev)
 
-    cur.close()
-    conn.close()
+        cur.close()
 
     filas = [
         "Monto colocado desde el incio",
@@ -297,6 +289,35 @@ def calcular_metricas_financieras(fecha_ev_str: str):
 # ============================
 # Cálculo de "Indicadores relevantes"
 # ============================
+# Una sola consulta: las seis medias salen de AVG(CASE ...) sobre un único
+# recorrido de credits_details (AVG ignora los NULL del CASE igual que un
+# WHERE) y los activos de RX_cartera_historico van como subconsultas.
+# Las ocho columnas salen como DOUBLE: cada fila de Indicadores queda de un
+# solo tipo (sin mezclar float y Decimal) y pasa limpia a Arrow en el preview.
+# Los créditos de prueba son los ids 1 a 5, así que su exclusión se escribe
+# como rango (credit_id > 5). Con el índice
+#   ALTER TABLE calculados.credits_details
+#     ADD INDEX ix_indicadores (started_at, credit_id, plazo, capital);
+# la consulta se resuelve solo con el índice (EXPLAIN: "Using index").
+
+Q_INDICADORES = """
+    SELECT
+      CAST(AVG(CASE WHEN started_at >= %s AND credit_id > 5 THEN plazo END) AS DOUBLE),
+      CAST(AVG(CASE WHEN started_at >= %s AND credit_id > 5 THEN plazo END) AS DOUBLE),
+      CAST(AVG(CASE WHEN credit_id > 5 THEN plazo END) AS DOUBLE),
+      CAST(AVG(CASE WHEN started_at >= %s THEN capital END) AS DOUBLE),
+      CAST(AVG(CASE WHEN started_at >= %s THEN capital END) AS DOUBLE),
+      CAST(AVG(capital) AS DOUBLE),
+      (SELECT CAST(COALESCE(SUM(num_clientes_activos), 0) AS DOUBLE)
+       FROM calculados.RX_cartera_historico
+       WHERE mes = %s),
+      (SELECT CAST(COALESCE(SUM(num_creditos_activos), 0) AS DOUBLE)
+       FROM calculados.RX_cartera_historico
+       WHERE mes = %s)
+    FROM calculados.credits_details
+    WHERE started_at <= %s
+"""
+
 
 def calcular_indicadores_relevantes(fecha_ev_str: str):
     fecha_ev = parse_fecha_ev(fecha_ev_str)
@@ -304,95 +325,27 @@ def calcular_indicadores_relevantes(fecha_ev_str: str):
     start_ytd = date(fecha_ev.year, 1, 1)
     start_ltm = fecha_ev - timedelta(days=365)
 
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    # Duración promedio
-    cur.execute(
-        """
-        SELECT AVG(plazo)
-        FROM calculados.credits_details
-        WHERE started_at >= %(start_ytd)s
-          AND started_at <= %(fecha_ev)s
-          AND credit_id NOT IN (1,2,3,4,5)
-        """,
-        {"start_ytd": start_ytd, "fecha_ev": fecha_ev},
-    )
-    dur_ytd = cur.fetchone()[0]
-
-    cur.execute(
-        """
-        SELECT AVG(plazo)
-        FROM calculados.credits_details
-        WHERE started_at >= %(start_ltm)s
-          AND started_at <= %(fecha_ev)s
-          AND credit_id NOT IN (1,2,3,4,5)
-        """,
-        {"start_ltm": start_ltm, "fecha_ev": fecha_ev},
-    )
-    dur_ltm = cur.fetchone()[0]
-
-    cur.execute(
-        """
-        SELECT AVG(plazo)
-        FROM calculados.credits_details
-        WHERE started_at <= %(fecha_ev)s
-          AND credit_id NOT IN (1,2,3,4,5)
-        """,
-        {"fecha_ev": fecha_ev},
-    )
-    dur_hist = cur.fetchone()[0]
-
-    # Ticket promedio
-    cur.execute(
-        """
-        SELECT AVG(capital)
-        FROM calculados.credits_details
-        WHERE started_at >= %(start_ytd)s
-          AND started_at <= %(fecha_ev)s
-        """,
-        {"start_ytd": start_ytd, "fecha_ev": fecha_ev},
-    )
-    ticket_ytd = cur.fetchone()[0]
-
-    cur.execute(
-        """
-        SELECT AVG(capital)
-        FROM calculados.credits_details
-        WHERE started_at >= %(start_ltm)s
-          AND started_at <= %(fecha_ev)s
-        """,
-        {"start_ltm": start_ltm, "fecha_ev": fecha_ev},
-    )
-    ticket_ltm = cur.fetchone()[0]
-
-    cur.execute(
-        """
-        SELECT AVG(capital)
-        FROM calculados.credits_details
-        WHERE started_at <= %(fecha_ev)s
-        """,
-        {"fecha_ev": fecha_ev},
-    )
-    ticket_hist = cur.fetchone()[0]
-
-    # Número de clientes / créditos activos
-    cur.execute(
-        """
-        SELECT
-          COALESCE(SUM(num_clientes_activos), 0),
-          COALESCE(SUM(num_creditos_activos), 0)
-        FROM calculados.RX_cartera_historico
-        WHERE mes = %(fecha_ev)s
-        """,
-        {"fecha_ev": fecha_ev},
-    )
-    res = cur.fetchone()
-    num_clientes_activos = res[0]
-    num_creditos_activos = res[1]
+    with _conn() as conn:
+        # Sentencia preparada como en Financieros: parámetros por protocolo
+        # binario, sin reescribir las fechas como texto dentro del SQL
+        cur = conn.cursor(prepared=True)
+
+        (
+            dur_ytd,
+            dur_ltm,
+            dur_hist,
+            ticket_ytd,
+            ticket_ltm,
+            ticket_hist,
+            num_clientes_activos,
+            num_creditos_activos,
+        ) = _fetch_row(
+            cur,
+            Q_INDICADORES,
+            (start_ytd, start_ltm, start_ytd, start_ltm, fecha_ev, fecha_ev, fecha_ev),
+        )
 
-    cur.close()
-    conn.close()
+        cur.close()
 
     filas = [
         "Duracion promedio del financiamiento (meses)",
@@ -411,111 +364,116 @@ def calcular_indicadores_relevantes(fecha_ev_str: str):
 # ============================
 # Cálculo de "Colocacion mensual"
 # ============================
+# Las cuatro fuentes en una consulta: cada CTE agrupa su tabla por mes y el
+# LEFT JOIN contra la unión de meses emula el FULL OUTER JOIN que antes se
+# hacía con pd.merge(how="outer"). El mes viaja como entero YYYYMM (ym): se
+# agrupa y une como número y el texto 'YYYY-MM' se arma una vez en pandas
+# (mes_desde_ym). Si credits_details crece, una columna generada
+# ym = YEAR(started_at) * 100 + MONTH(started_at) con índice evita calcularlo.
+
+Q_COLOCACION_MENSUAL = """
+    WITH cd AS (
+      SELECT
+        YEAR(started_at) * 100 + MONTH(started_at) AS ym,
+        COALESCE(SUM(capital), 0) AS valor_capital_total,
+        COALESCE(SUM(vp), 0)      AS valor_pagare_total
+      FROM calculados.credits_details
+      WHERE started_at >= %s
+        AND started_at <= %s
+      GROUP BY ym
+    ),
+    nuevos AS (
+      SELECT
+        YEAR(period_month) * 100 + MONTH(period_month) AS ym,
+        COALESCE(SUM(colocacion_nuevos_amount), 0) AS Nuevo
+      FROM calculados.RX_colocacion_nuevos
+      WHERE period_month >= %s
+        AND period_month <= %s
+      GROUP BY ym
+    ),
+    ref AS (
+      SELECT
+        CAST(REPLACE(month_year, '-', '') AS UNSIGNED) AS ym,
+        COALESCE(SUM(refinanciamiento_amount), 0) AS Refinanciamiento
+      FROM calculados.RX_colocacion_refinanciamientos
+      WHERE month_year >= %s
+        AND month_year <= %s
+      GROUP BY month_year
+    ),
+    tpv AS (
+      SELECT
+        CAST(REPLACE(month_year, '-', '') AS UNSIGNED) AS ym,
+        COALESCE(SUM(tpv_amount), 0) AS TPV,
+        COALESCE(SUM(dom_amount), 0) AS Domiciliado
+      FROM calculados.RX_colocacion_mensual
+      WHERE month_year >= %s
+        AND month_year <= %s
+      GROUP BY month_year
+    ),
+    meses AS (
+      SELECT ym FROM cd
+      UNION SELECT ym FROM nuevos
+      UNION SELECT ym FROM ref
+      UNION SELECT ym FROM tpv
+    )
+    SELECT
+      meses.ym,
+      cd.valor_capital_total,
+      cd.valor_pagare_total,
+      nuevos.Nuevo,
+      ref.Refinanciamiento,
+      tpv.TPV,
+      tpv.Domiciliado
+    FROM meses
+    LEFT JOIN cd ON cd.ym = meses.ym
+    LEFT JOIN nuevos ON nuevos.ym = meses.ym
+    LEFT JOIN ref ON ref.ym = meses.ym
+    LEFT JOIN tpv ON tpv.ym = meses.ym
+    ORDER BY meses.ym
+"""
+
 
 def calcular_colocacion_mensual(fecha_ev_str: str) -> pd.DataFrame:
     fecha_ev = parse_fecha_ev(fecha_ev_str)
     fecha_ev_ym = f"{fecha_ev.year}-{fecha_ev.month:02d}"
     start_global = date(2025, 1, 1)
 
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    # credits_details
-    cur.execute(
-        """
-        SELECT
-          DATE_FORMAT(started_at, '%Y-%m') AS Mes,
-          COALESCE(SUM(capital), 0) AS valor_capital_total,
-          COALESCE(SUM(vp), 0)      AS valor_pagare_total
-        FROM calculados.credits_details
-        WHERE started_at >= %s
-          AND started_at <= %s
-        GROUP BY DATE_FORMAT(started_at, '%Y-%m')
-        """,
-        (start_global, fecha_ev),
-    )
-    rows = cur.fetchall()
-    df_cd = pd.DataFrame(rows, columns=["Mes", "Valor capital total", "Valor pagare total"])
-
-    # RX_colocacion_nuevos
-    cur.execute(
-        """
-        SELECT
-          DATE_FORMAT(period_month, '%Y-%m') AS Mes,
-          COALESCE(SUM(colocacion_nuevos_amount), 0) AS Nuevo
-        FROM calculados.RX_colocacion_nuevos
-        WHERE period_month >= %s
-          AND period_month <= %s
-        GROUP BY DATE_FORMAT(period_month, '%Y-%m')
-        """,
-        (start_global, fecha_ev),
-    )
-    rows = cur.fetchall()
-    df_nuevos = pd.DataFrame(rows, columns=["Mes", "Nuevo"])
-
-    # RX_colocacion_refinanciamientos
-    cur.execute(
-        """
-        SELECT
-          month_year AS Mes,
-          COALESCE(SUM(refinanciamiento_amount), 0) AS Refinanciamiento
-        FROM calculados.RX_colocacion_refinanciamientos
-        WHERE month_year >= %s
-          AND month_year <= %s
-        GROUP BY month_year
-        """,
-        ("2025-01", fecha_ev_ym),
-    )
-    rows = cur.fetchall()
-    df_ref = pd.DataFrame(rows, columns=["Mes", "Refinanciamiento"])
-
-    # RX_colocacion_mensual
-    cur.execute(
-        """
-        SELECT
-          month_year AS Mes,
-          COALESCE(SUM(tpv_amount), 0) AS TPV,
-          COALESCE(SUM(dom_amount), 0) AS Domiciliado
-        FROM calculados.RX_colocacion_mensual
-        WHERE month_year >= %s
-          AND month_year <= %s
-        GROUP BY month_year
-        """,
-        ("2025-01", fecha_ev_ym),
-    )
-    rows = cur.fetchall()
-    df_tpv = pd.DataFrame(rows, columns=["Mes", "TPV", "Domiciliado"])
-
-    cur.close()
-    conn.close()
-
-    dfs = [df_cd, df_nuevos, df_ref, df_tpv]
-    df_final = None
-    for d in dfs:
-        if d is None or d.empty:
-            continue
-        if df_final is None:
-            df_final = d
-        else:
-            df_final = pd.merge(df_final, d, on="Mes", how="outer")
-
-    if df_final is None:
-        df_final = pd.DataFrame(
-            columns=[
-                "Mes",
-                "Valor capital total",
-                "Valor pagare total",
-                "Nuevo",
-                "Refinanciamiento",
-                "TPV",
-                "Domiciliado",
-            ]
+    with _conn() as conn:
+        cur = conn.cursor()
+
+        cur.execute(
+            Q_COLOCACION_MENSUAL,
+            (
+                start_global, fecha_ev,  # credits_details
+                start_global, fecha_ev,  # RX_colocacion_nuevos
+                "2025-01", fecha_ev_ym,  # RX_colocacion_refinanciamientos
+                "2025-01", fecha_ev_ym,  # RX_colocacion_mensual
+            ),
         )
+        rows = cur.fetchall()
+
+        cur.close()
+
+    # coerce_float: los DECIMAL de MySQL llegan como float64 en bloque en vez
+    # de columnas object de Decimal
+    df_final = pd.DataFrame.from_records(
+        rows,
+        coerce_float=True,
+        columns=[
+            "Mes",
+            "Valor capital total",
+            "Valor pagare total",
+            "Nuevo",
+            "Refinanciamiento",
+            "TPV",
+            "Domiciliado",
+        ],
+    )
+    if df_final.empty:
         return df_final
 
-    df_final["Mes"] = df_final["Mes"].astype(str)
-    df_final["Mes_dt"] = pd.to_datetime(df_final["Mes"], format="%Y-%m", errors="coerce")
-    df_final = df_final.sort_values("Mes_dt").drop(columns=["Mes_dt"])
+    # Ya viene ordenado por mes desde SQL (ORDER BY meses.ym)
+    df_final["Mes"] = mes_desde_ym(df_final["Mes"])
 
     for col in ["Valor capital total", "Valor pagare total", "Nuevo", "Refinanciamiento", "TPV", "Domiciliado"]:
         if col in df_final.columns:
@@ -543,61 +501,58 @@ def calcular_amortizacion_mensual(fecha_ev_str: str) -> pd.DataFrame:
     fecha_ev = parse_fecha_ev(fecha_ev_str)
     start_global = date(2025, 1, 1)
 
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    # cartera.conciliations
-    cur.execute(
-        """
-        SELECT
-          DATE_FORMAT(date, '%Y-%m') AS Mes,
-          COALESCE(SUM(capital_return), 0)         AS Capital,
-          COALESCE(SUM(collection_management), 0)  AS GC,
-          COALESCE(SUM(iva), 0)                    AS IVA,
-          COALESCE(SUM(is_lastpayment), 0)         AS Pagos_de_liquidacion
-        FROM cartera.conciliations
-        WHERE date >= %s
-          AND date <= %s
-        GROUP BY DATE_FORMAT(date, '%Y-%m')
-        """,
-        (start_global, fecha_ev),
-    )
-    rows = cur.fetchall()
-    df_conc = pd.DataFrame(
-        rows,
-        columns=["Mes", "Capital", "GC", "IVA", "Pagos de liquidacion"]
-    )
+    with _conn() as conn:
+        cur = conn.cursor()
+
+        # cartera.conciliations
+        cur.execute(
+            """
+            SELECT
+              YEAR(date) * 100 + MONTH(date) AS ym,
+              COALESCE(SUM(capital_return), 0)         AS Capital,
+              COALESCE(SUM(collection_management), 0)  AS GC,
+              COALESCE(SUM(iva), 0)                    AS IVA,
+              COALESCE(SUM(is_lastpayment), 0)         AS Pagos_de_liquidacion,
+              COALESCE(SUM(capital_return), 0)
+                + COALESCE(SUM(collection_management), 0)
+                + COALESCE(SUM(iva), 0)                AS Pago_total
+            FROM cartera.conciliations
+            WHERE date >= %s
+              AND date <= %s
+            GROUP BY ym
+            ORDER BY ym
+            """,
+            (start_global, fecha_ev),
+        )
+        rows = cur.fetchall()
+        df_conc = pd.DataFrame.from_records(
+            rows,
+            columns=["Mes", "Capital", "GC", "IVA", "Pagos de liquidacion", "Pago total"],
+            coerce_float=True,
+        )
 
-    # RX_cartera_historico
-    cur.execute(
-        """
-        SELECT
-          DATE_FORMAT(mes, '%Y-%m') AS Mes,
-          COALESCE(SUM(due_capital_total), 0) AS Valor_de_la_cartera
-        FROM calculados.RX_cartera_historico
-        WHERE mes >= %s
-          AND mes <= %s
-        GROUP BY DATE_FORMAT(mes, '%Y-%m')
-        """,
-        (start_global, fecha_ev),
-    )
-    rows = cur.fetchall()
-    df_cartera = pd.DataFrame(rows, columns=["Mes", "Valor de la cartera"])
-
-    cur.close()
-    conn.close()
-
-    dfs = [df_conc, df_cartera]
-    df_final = None
-    for d in dfs:
-        if d is None or d.empty:
-            continue
-        if df_final is None:
-            df_final = d
-        else:
-            df_final = pd.merge(df_final, d, on="Mes", how="outer")
-
-    if df_final is None:
+        # RX_cartera_historico
+        cur.execute(
+            """
+            SELECT
+              YEAR(mes) * 100 + MONTH(mes) AS ym,
+              COALESCE(SUM(due_capital_total), 0) AS Valor_de_la_cartera
+            FROM calculados.RX_cartera_historico
+            WHERE mes >= %s
+              AND mes <= %s
+            GROUP BY ym
+            ORDER BY ym
+            """,
+            (start_global, fecha_ev),
+        )
+        rows = cur.fetchall()
+        df_cartera = pd.DataFrame.from_records(rows, columns=["Mes", "Valor de la cartera"], coerce_float=True)
+
+        cur.close()
+
+    parts = [d.set_index("Mes") for d in (df_conc, df_cartera) if d is not None and not d.empty]
+
+    if not parts:
         df_final = pd.DataFrame(
             columns=[
                 "Mes",
@@ -611,15 +566,18 @@ def calcular_amortizacion_mensual(fecha_ev_str: str) -> pd.DataFrame:
         )
         return df_final
 
-    df_final["Mes"] = df_final["Mes"].astype(str)
-    df_final["Mes_dt"] = pd.to_datetime(df_final["Mes"], format="%Y-%m", errors="coerce")
-    df_final = df_final.sort_values("Mes_dt").drop(columns=["Mes_dt"])
+    # Mes es llave única en cada parte: join por índice (una sola pasada
+    # con la forma de lista) en vez de un merge con tabla hash por columna
+    # El orden de la unión de llaves depende de la versión de pandas (2.x
+    # deja los meses de la segunda parte al final): se ordena explícitamente
+    df_final = parts[0].join(parts[1:], how="outer").sort_index().reset_index()
+    df_final["Mes"] = mes_desde_ym(df_final["Mes"])
 
-    for col in ["Capital", "GC", "IVA", "Pagos de liquidacion", "Valor de la cartera"]:
-        if col in df_final.columns:
-            df_final[col] = df_final[col].fillna(0)
-
-    df_final["Pago total"] = df_final.get("Capital", 0) + df_final.get("GC", 0) + df_final.get("IVA", 0)
+    num_cols = [
+        c for c in ["Capital", "GC", "IVA", "Pagos de liquidacion", "Pago total", "Valor de la cartera"]
+        if c in df_final.columns
+    ]
+    df_final[num_cols] = df_final[num_cols].fillna(0)
 
     cols_order = [
         "Mes",
@@ -639,6 +597,47 @@ def calcular_amortizacion_mensual(fecha_ev_str: str) -> pd.DataFrame:
 # Cálculo de "Distribucion cartera" (giro / provincia)
 # ============================
 
+# Cartera vigente agrupada por giro y provincia a la vez (un solo recorrido de
+# credits_details en `base`). Los NULL se quedan en ese GROUP BY: un crédito
+# sin provincia sí cuenta para su giro (y al revés). El % y el orden salen ya
+# calculados de MySQL, una tabla por valor de `tabla`.
+Q_DISTRIBUCION = """
+    WITH base AS (
+      SELECT
+        giro_del_cliente,
+        province,
+        COALESCE(SUM(capital), 0) AS monto
+      FROM calculados.credits_details
+      WHERE completed_at IS NULL
+        AND deleted_at IS NULL
+        AND suspended_at IS NULL
+        AND (giro_del_cliente IS NOT NULL OR province IS NOT NULL)
+      GROUP BY giro_del_cliente, province
+    ),
+    por_tabla AS (
+      SELECT 'giro' AS tabla, giro_del_cliente AS clave, SUM(monto) AS monto
+      FROM base
+      WHERE giro_del_cliente IS NOT NULL
+      GROUP BY giro_del_cliente
+      UNION ALL
+      SELECT 'province' AS tabla, province AS clave, SUM(monto) AS monto
+      FROM base
+      WHERE province IS NOT NULL
+      GROUP BY province
+    )
+    SELECT
+      tabla,
+      clave,
+      monto,
+      COALESCE(
+        CAST(monto AS DOUBLE) / NULLIF(CAST(SUM(monto) OVER (PARTITION BY tabla) AS DOUBLE), 0),
+        0
+      ) AS pct
+    FROM por_tabla
+    ORDER BY tabla, monto DESC
+"""
+
+
 def calcular_distribucion_cartera(fecha_ev_str: str):
     """
     Calcula dos tablas:
@@ -652,57 +651,26 @@ def calcular_distribucion_cartera(fecha_ev_str: str):
     """
     fecha_ev = parse_fecha_ev(fecha_ev_str)
 
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    # -----------------------------
-    # BLOQUE: POR GIRO
-    # -----------------------------
-    cur.execute(
-        """
-        SELECT
-          giro_del_cliente,
-          COALESCE(SUM(capital), 0) AS monto
-        FROM calculados.credits_details
-        WHERE completed_at IS NULL
-          AND deleted_at IS NULL
-          AND suspended_at IS NULL
-          AND giro_del_cliente IS NOT NULL
-        GROUP BY giro_del_cliente
-        """
-    )
-    rows = cur.fetchall()
-    df_giro = pd.DataFrame(rows, columns=["giro_del_cliente", "monto"])
-
-    total_giro = df_giro["monto"].sum() if not df_giro.empty else 0
-    df_giro["% de la cartera"] = df_giro["monto"] / total_giro if total_giro else 0
-    df_giro = df_giro.sort_values("monto", ascending=False).reset_index(drop=True)
-
-    # -----------------------------
-    # BLOQUE: POR PROVINCIA
-    # -----------------------------
-    cur.execute(
-        """
-        SELECT
-          province,
-          COALESCE(SUM(capital), 0) AS monto
-        FROM calculados.credits_details
-        WHERE completed_at IS NULL
-          AND deleted_at IS NULL
-          AND suspended_at IS NULL
-          AND province IS NOT NULL
-        GROUP BY province
-        """
-    )
-    rows = cur.fetchall()
-    df_prov = pd.DataFrame(rows, columns=["province", "monto"])
+    with _conn() as conn:
+        cur = conn.cursor()
+        cur.execute(Q_DISTRIBUCION)
+        rows = cur.fetchall()
+        cur.close()
 
-    total_prov = df_prov["monto"].sum() if not df_prov.empty else 0
-    df_prov["% de la cartera"] = df_prov["monto"] / total_prov if total_prov else 0
-    df_prov = df_prov.sort_values("monto", ascending=False).reset_index(drop=True)
+    df = pd.DataFrame.from_records(
+        rows, columns=["tabla", "clave", "monto", "% de la cartera"], coerce_float=True
+    )
 
-    cur.close()
-    conn.close()
+    df_giro = (
+        df.loc[df["tabla"] == "giro", ["clave", "monto", "% de la cartera"]]
+        .rename(columns={"clave": "giro_del_cliente"})
+        .reset_index(drop=True)
+    )
+    df_prov = (
+        df.loc[df["tabla"] == "province", ["clave", "monto", "% de la cartera"]]
+        .rename(columns={"clave": "province"})
+        .reset_index(drop=True)
+    )
 
     return df_giro, df_prov
 
@@ -711,32 +679,91 @@ def calcular_distribucion_cartera(fecha_ev_str: str):
 # Generar Excel (todas las pestañas)
 # ============================
 
-def generar_excel_financieros(fecha_ev_str: str, nombre_archivo: str = "reporte_financiero.xlsx"):
-    # FINANCIEROS
-    filas_fin, valores_capital, valores_vp = calcular_metricas_financieras(fecha_ev_str)
-    df_fin = pd.DataFrame({
-        "Concepto": filas_fin,
-        "Valor capital": valores_capital,
-        "Valor pagare": valores_vp,
-    })
-
-    # INDICADORES
-    filas_ind, col_ytd, col_ltm, col_hist = calcular_indicadores_relevantes(fecha_ev_str)
-    df_ind = pd.DataFrame({
-        "Indicador": filas_ind,
-        "Year to date": col_ytd,
-        "LTM last twelve months": col_ltm,
-        "Historico desde el inicio": col_hist,
-    })
-
-    # COLOCACION MENSUAL
-    df_col = calcular_colocacion_mensual(fecha_ev_str)
-
-    # AMORTIZACION MENSUAL
-    df_amort = calcular_amortizacion_mensual(fecha_ev_str)
-
-    # DISTRIBUCION CARTERA
-    df_giro, df_prov = calcular_distribucion_cartera(fecha_ev_str)
+def _valores(df: pd.DataFrame, start: int, stop: int) -> np.ndarray:
+    """
+    Columnas [start, stop) de df como una matriz ya convertida a float, lista
+    para write_row/write_column; los faltantes quedan en None (celda vacía).
+    """
+    arr = df.iloc[:, start:stop].to_numpy(dtype="float64", na_value=np.nan)
+    return np.where(np.isnan(arr), None, arr)
+
+
+def _escribir_mensual(workbook, nombre: str, df: pd.DataFrame, header_fmt, valor_fmt):
+    """
+    Hoja mensual (Mes + columnas de montos) escrita directo con xlsxwriter:
+    encabezado, la columna Mes y cada columna de montos en una sola llamada,
+    sin pasar por to_excel() y luego reescribir las celdas con formato.
+    """
+    ws = workbook.add_worksheet(nombre)
+    ws.write_row(0, 0, list(df.columns), header_fmt)
+    ws.write_column(1, 0, df.iloc[:, 0].tolist())
+    vals = _valores(df, 1, df.shape[1])
+    for col_idx in range(1, df.shape[1]):
+        ws.write_column(1, col_idx, vals[:, col_idx - 1].tolist(), valor_fmt)
+    ws.set_column("A:A", 12)
+    ws.set_column("B:G", 18)
+    return ws
+
+
+def calcular_reporte(fecha_ev_str: str) -> dict:
+    """
+    Corre los cinco cálculos del reporte y regresa sus tablas por pestaña:
+    fin, ind, col, amort, giro, prov. escribir_excel() las vuelca a Excel;
+    la app de Streamlit reutiliza el mismo resultado para la vista previa.
+    """
+    # Las cinco secciones son independientes y casi todo su tiempo es espera
+    # de MySQL: se consultan a la vez, cada hilo con su conexión del pool.
+    with ThreadPoolExecutor(max_workers=_SECCIONES) as ex:
+        fut_fin = ex.submit(calcular_metricas_financieras, fecha_ev_str)
+        fut_ind = ex.submit(calcular_indicadores_relevantes, fecha_ev_str)
+        fut_col = ex.submit(calcular_colocacion_mensual, fecha_ev_str)
+        fut_amort = ex.submit(calcular_amortizacion_mensual, fecha_ev_str)
+        fut_dist = ex.submit(calcular_distribucion_cartera, fecha_ev_str)
+
+        # FINANCIEROS
+        filas_fin, valores_capital, valores_vp = fut_fin.result()
+        df_fin = pd.DataFrame({
+            "Concepto": filas_fin,
+            "Valor capital": valores_capital,
+            "Valor pagare": valores_vp,
+        })
+
+        # INDICADORES
+        filas_ind, col_ytd, col_ltm, col_hist = fut_ind.result()
+        df_ind = pd.DataFrame({
+            "Indicador": filas_ind,
+            "Year to date": col_ytd,
+            "LTM last twelve months": col_ltm,
+            "Historico desde el inicio": col_hist,
+        })
+
+        # COLOCACION MENSUAL
+        df_col = fut_col.result()
+
+        # AMORTIZACION MENSUAL
+        df_amort = fut_amort.result()
+
+        # DISTRIBUCION CARTERA
+        df_giro, df_prov = fut_dist.result()
+
+    return {
+        "fin": df_fin,
+        "ind": df_ind,
+        "col": df_col,
+        "amort": df_amort,
+        "giro": df_giro,
+        "prov": df_prov,
+    }
+
+
+def escribir_excel(reporte: dict, nombre_archivo: str = "reporte_financiero.xlsx"):
+    """Escribe el resultado de calcular_reporte() en nombre_archivo."""
+    df_fin = reporte["fin"]
+    df_ind = reporte["ind"]
+    df_col = reporte["col"]
+    df_amort = reporte["amort"]
+    df_giro = reporte["giro"]
+    df_prov = reporte["prov"]
 
     with pd.ExcelWriter(nombre_archivo, engine="xlsxwriter") as writer:
         workbook = writer.book
@@ -744,22 +771,19 @@ def generar_excel_financieros(fecha_ev_str: str, nombre_archivo: str = "reporte_
         num_2dec_fmt = workbook.add_format({"num_format": "0.00"})
         int_fmt = workbook.add_format({"num_format": "#,##0"})
         percent_fmt = workbook.add_format({"num_format": "0.00%"})
+        # mismo estilo de encabezado que pone to_excel()
+        header_fmt = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
 
         # === Financieros ===
         df_fin.to_excel(writer, sheet_name="Financieros", index=False)
         ws_fin = writer.sheets["Financieros"]
         ws_fin.set_column("B:C", 18)
 
-        for row_idx in range(1, len(df_fin) + 1):
-            concepto = df_fin.iloc[row_idx - 1, 0]
+        vals_fin = _valores(df_fin, 1, 3)
+        for row_idx, concepto in enumerate(df_fin["Concepto"].to_numpy(), start=1):
             if concepto == "Crecimiento YoY de colocacion":
                 continue
-            val_cap = df_fin.iloc[row_idx - 1, 1]
-            val_vp = df_fin.iloc[row_idx - 1, 2]
-            if val_cap is not None:
-                ws_fin.write_number(row_idx, 1, float(val_cap), currency_fmt)
-            if val_vp is not None:
-                ws_fin.write_number(row_idx, 2, float(val_vp), currency_fmt)
+            ws_fin.write_row(row_idx, 1, vals_fin[row_idx - 1].tolist(), currency_fmt)
 
         # === Indicadores relevantes ===
         df_ind.to_excel(writer, sheet_name="Indicadores relevantes", index=False)
@@ -767,42 +791,15 @@ def generar_excel_financieros(fecha_ev_str: str, nombre_archivo: str = "reporte_
         ws_ind.set_column("A:A", 45)
         ws_ind.set_column("B:D", 20)
 
-        for row_idx in range(1, len(df_ind) + 1):
-            indicador = df_ind.iloc[row_idx - 1, 0]
-            vals = df_ind.iloc[row_idx - 1, 1:4]
-            if indicador.startswith("Duracion promedio"):
-                fmt = num_2dec_fmt
-            elif indicador.startswith("Ticket promedio"):
-                fmt = currency_fmt
-            else:
-                fmt = int_fmt
-            for col_off, val in enumerate(vals, start=1):
-                if val is not None:
-                    ws_ind.write_number(row_idx, col_off, float(val), fmt)
-
-        # === Colocacion mensual ===
-        df_col.to_excel(writer, sheet_name="Colocacion mensual", index=False)
-        ws_col = writer.sheets["Colocacion mensual"]
-        ws_col.set_column("A:A", 12)
-        ws_col.set_column("B:G", 18)
-
-        for row_idx in range(1, len(df_col) + 1):
-            for col_idx in range(1, 7):
-                val = df_col.iloc[row_idx - 1, col_idx]
-                if val is not None:
-                    ws_col.write_number(row_idx, col_idx, float(val), currency_fmt)
-
-        # === Amortizacion mensual ===
-        df_amort.to_excel(writer, sheet_name="Amortizacion mensual", index=False)
-        ws_am = writer.sheets["Amortizacion mensual"]
-        ws_am.set_column("A:A", 12)
-        ws_am.set_column("B:G", 18)
-
-        for row_idx in range(1, len(df_amort) + 1):
-            for col_idx in range(1, 7):
-                val = df_amort.iloc[row_idx - 1, col_idx]
-                if val is not None:
-                    ws_am.write_number(row_idx, col_idx, float(val), currency_fmt)
+        # Formato por renglón en el orden fijo de calcular_indicadores_relevantes:
+        # duración, ticket, clientes activos, créditos activos
+        row_fmts = [num_2dec_fmt, currency_fmt, int_fmt, int_fmt]
+        for row_idx, (vals, fmt) in enumerate(zip(_valores(df_ind, 1, 4).tolist(), row_fmts), start=1):
+            ws_ind.write_row(row_idx, 1, vals, fmt)
+
+        # === Colocacion mensual / Amortizacion mensual ===
+        _escribir_mensual(workbook, "Colocacion mensual", df_col, header_fmt, currency_fmt)
+        _escribir_mensual(workbook, "Amortizacion mensual", df_amort, header_fmt, currency_fmt)
 
         # === Distribucion cartera (última pestaña) ===
         # Primer bloque: por giro_del_cliente, columnas A-C
@@ -832,26 +829,22 @@ def generar_excel_financieros(fecha_ev_str: str, nombre_archivo: str = "reporte_
         ws_dist.set_column("F:G", 18)
 
         # Formatear bloque giro: columnas B moneda, C porcentaje
-        for row_idx in range(1, len(df_giro) + 1):
-            monto = df_giro.iloc[row_idx - 1, 1]
-            perc = df_giro.iloc[row_idx - 1, 2]
-            if monto is not None:
-                ws_dist.write_number(row_idx, 1, float(monto), currency_fmt)
-            if perc is not None:
-                ws_dist.write_number(row_idx, 2, float(perc), percent_fmt)
+        vals_giro = _valores(df_giro, 1, 3)
+        ws_dist.write_column(1, 1, vals_giro[:, 0].tolist(), currency_fmt)
+        ws_dist.write_column(1, 2, vals_giro[:, 1].tolist(), percent_fmt)
 
         # Formatear bloque province: columnas F moneda, G porcentaje
-        for row_idx in range(1, len(df_prov) + 1):
-            monto = df_prov.iloc[row_idx - 1, 1]
-            perc = df_prov.iloc[row_idx - 1, 2]
-            if monto is not None:
-                ws_dist.write_number(row_idx, 5, float(monto), currency_fmt)   # col F
-            if perc is not None:
-                ws_dist.write_number(row_idx, 6, float(perc), percent_fmt)    # col G
+        vals_prov = _valores(df_prov, 1, 3)
+        ws_dist.write_column(1, 5, vals_prov[:, 0].tolist(), currency_fmt)   # col F
+        ws_dist.write_column(1, 6, vals_prov[:, 1].tolist(), percent_fmt)    # col G
 
     print(f"Archivo generado: {nombre_archivo}")
 
 
+def generar_excel_financieros(fecha_ev_str: str, nombre_archivo: str = "reporte_financiero.xlsx"):
+    escribir_excel(calcular_reporte(fecha_ev_str), nombre_archivo)
+
+
 if __name__ == "__main__":
     generar_excel_financieros("2025-12", "reporte_concejo_2025-12.xlsx")
 
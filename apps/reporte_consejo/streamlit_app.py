@@ -11,8 +11,19 @@ import os
 import tempfile
 import streamlit as st
 
-# Import WITHOUT modifying existing logic/functions
-import main
+# main (mysql.connector + pandas + xlsxwriter) se importa hasta que se usa:
+# pintar la página con el formulario no necesita nada de eso.
+
+
+@st.cache_data(ttl=300, show_spinner="Consultando la base de datos...")
+def _reporte(fecha_ev: str) -> dict:
+    """
+    Tablas del reporte para fecha_ev. Generar el Excel y la vista previa
+    comparten este resultado, así que la segunda no vuelve a consultar MySQL.
+    """
+    import main
+
+    return main.calcular_reporte(fecha_ev)
 
 
 st.set_page_config(page_title="Reporte Consejo", layout="wide")
@@ -34,7 +45,9 @@ if generar:
         tmp_dir = tempfile.mkdtemp(prefix="reporte_consejo_")
         out_path = os.path.join(tmp_dir, nombre_archivo)
 
-        main.generar_excel_financieros(fecha_ev, out_path)
+        import main
+
+        main.escribir_excel(_reporte(fecha_ev), out_path)
 
         with open(out_path, "rb") as f:
             data = f.read()
@@ -56,41 +69,28 @@ show_preview = st.checkbox("Mostrar vista previa", value=False)
 
 if show_preview:
     try:
-        # These calls reuse the existing functions as-is.
-        filas_fin, valores_capital, valores_vp = main.calcular_metricas_financieras(fecha_ev)
-        df_fin = main.pd.DataFrame({
-            "Concepto": filas_fin,
-            "Valor capital": valores_capital,
-            "Valor pagare": valores_vp,
-        })
+        reporte = _reporte(fecha_ev)
+
         st.markdown("### Financieros")
-        st.dataframe(df_fin, use_container_width=True)
-
-        filas_ind, col_ytd, col_ltm, col_hist = main.calcular_indicadores_relevantes(fecha_ev)
-        df_ind = main.pd.DataFrame({
-            "Indicador": filas_ind,
-            "Year to date": col_ytd,
-            "LTM last twelve months": col_ltm,
-            "Historico desde el inicio": col_hist,
-        })
+        st.dataframe(reporte["fin"], use_container_width=True)
+
         st.markdown("### Indicadores relevantes")
-        st.dataframe(df_ind, use_container_width=True)
+        st.dataframe(reporte["ind"], use_container_width=True)
 
         st.markdown("### Colocación mensual")
-        st.dataframe(main.calcular_colocacion_mensual(fecha_ev), use_container_width=True)
+        st.dataframe(reporte["col"], use_container_width=True)
 
         st.markdown("### Amortización mensual")
-        st.dataframe(main.calcular_amortizacion_mensual(fecha_ev), use_container_width=True)
+        st.dataframe(reporte["amort"], use_container_width=True)
 
         st.markdown("### Distribución cartera")
-        df_giro, df_prov = main.calcular_distribucion_cartera(fecha_ev)
         c1, c2 = st.columns(2)
         with c1:
             st.markdown("#### Por giro")
-            st.dataframe(df_giro, use_container_width=True)
+            st.dataframe(reporte["giro"], use_container_width=True)
         with c2:
             st.markdown("#### Por provincia")
-            st.dataframe(df_prov, use_container_width=True)
+            st.dataframe(reporte["prov"], use_container_width=True)
 
     except Exception as e:
         st.warning(f"No se pudo mostrar la vista previa: {e}")
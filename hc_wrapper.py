@@ -0,0 +1,287 @@
+# hc_wrapper.py
+# HayCash signature wrapper shared by pages/*.py: consistent look + nav-only
+# sidebar, and the launcher that embeds each sub-app under apps/.
+import os
+import re
+import textwrap
+from functools import lru_cache
+from pathlib import Path
+
+import streamlit as st
+import streamlit as _stmod  # sidebar proxy target
+
+ROOT = Path(__file__).resolve().parent
+STATIC = ROOT / "static"  # served at app/static/ (.streamlit/config.toml)
+
+# Checked once per process (this module is imported once, then shared by
+# every page and session) instead of a stat() on every rerun
+LOGO = STATIC / "haycash_logo.jpg"
+_HAS_LOGO = LOGO.exists()
+
+# Flags read by sub-apps that support running inside a wrapper page
+_EMBED_FLAGS = ("HC_EMBEDDED", "HC_SKIP_PAGE_CONFIG", "HC_SKIP_INTERNAL_AUTH")
+
+
+def _minify_css(css: str) -> str:
+    """Drop comments and collapse whitespace; run once at import."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r":\s+", ":", css)  # only after ":"; a space before it is a descendant selector
+    return re.sub(r"\s*([{};,])\s*", r"\1", css).strip() + "\n"
+
+
+# Signature CSS. The logo is a URL on Streamlit's static file server, so the
+# browser fetches and caches it once instead of receiving it base64-inlined
+# on every rerun. Kept readable here and minified once below.
+_SIGNATURE_CSS = """
+<style>
+  header[data-testid="stHeader"] {
+    height: 0 !important;
+    min-height: 0 !important;
+    display: none !important;
+  }
+
+  .block-container {
+    padding-top: 3.25rem !important;
+    padding-bottom: 2rem !important;
+    max-width: 98% !important;
+  }
+
+  [data-testid="stSidebarNav"] { display: none !important; }
+
+  section[data-testid="stSidebar"] {
+    background-color: #f8f9fa;
+    border-right: 1px solid #e0e0e0;
+  }
+
+  .hc-topbar {
+    width: 100%;
+    background: #314270;
+    border-radius: 12px 12px 0 0;
+    padding: 15px 25px;
+    display: flex;
+    align-items: center;
+    justify-content: space-between;
+    min-height: 160px;
+  }
+
+  .hc-topbar-title {
+    margin: 0;
+    font-size: 1.8rem;
+    font-weight: 800;
+    color: #ffffff;
+  }
+
+  .hc-topbar-subtitle {
+    margin: 0;
+    font-size: 1rem;
+    color: rgba(255,255,255,0.85);
+  }
+
+  .hc-topbar-logo {
+    background-image: url("app/static/haycash_logo.jpg");
+    background-repeat: no-repeat;
+    background-position: right center;
+    background-size: contain;
+    width: 600px;
+    height: 140px;
+    flex-shrink: 0;
+  }
+
+  .hc-accent {
+    height: 5px;
+    width: 100%;
+    background: #FFBA00;
+    border-radius: 0 0 12px 12px;
+    margin-bottom: 2rem;
+  }
+</style>
+"""
+_SIGNATURE_CSS = _minify_css(_SIGNATURE_CSS)
+
+# (page, label) for the sidebar links, in display order
+NAV = (
+    ("app.py", "🏠 Inicio"),
+    ("pages/01_Lector_CSF.py", "🧾 Lector CSF"),
+    ("pages/02_CSV_a_TXT_BBVA.py", "🏦 CSV a TXT BBVA"),
+    ("pages/03_Reporte_Interactivo_de_Leads.py", "📊 Reporte Leads"),
+    ("pages/04_Factoraje.py", "💳 Factoraje"),
+    ("pages/05_Lector_edocat.py", "📄 Lector Edocat"),
+    ("pages/06_reporte_consejo.py", "📈 Reporte Consejo"),
+    ("pages/07_lector_contrato.py", "📝 Lector Contrato"),
+)
+
+
+_SIDEBAR_TOP = (
+    '<img src="app/static/haycash_logo.jpg" alt="HayCash" style="width:100%">\n\n' if _HAS_LOGO else ""
+) + "### HayCash ToolBox"
+
+
+def sidebar_nav():
+    with st.sidebar:
+        # logo (from the static server, cached by the browser) and title in
+        # one markdown element instead of st.image + st.markdown
+        st.markdown(_SIDEBAR_TOP, unsafe_allow_html=True)
+        st.caption("NAVEGACIÓN PRINCIPAL")
+        st.divider()
+
+        for path, label in NAV:
+            st.page_link(path, label=label)
+
+        st.divider()
+        if st.session_state.get("auth_ok"):
+            user = st.session_state.get("auth_user") or "-"
+            st.caption(f"Usuario: **{user}**")
+
+
+# Header bar, dedented once here: after the <style> block, indented lines
+# would be parsed as a markdown code block
+_HEADER_TMPL = textwrap.dedent(
+    """
+    <div class="hc-topbar">
+      <div>
+        <div class="hc-topbar-title">{title}</div>
+        <div class="hc-topbar-subtitle">{subtitle}</div>
+      </div>
+      <div class="hc-topbar-logo"></div>
+    </div>
+    <div class="hc-accent"></div>
+    """
+)
+
+
+@lru_cache(maxsize=16)
+def _header_html(title: str, subtitle: str, extra_css: str) -> str:
+    return _SIGNATURE_CSS + extra_css + _HEADER_TMPL.format(title=title, subtitle=subtitle)
+
+
+def signature_header(title: str, subtitle: str, extra_css: str = ""):
+    # Stylesheet (plus any page-specific rules) and header bar go out as one
+    # markdown element, assembled once per page and reused on every rerun
+    st.markdown(_header_html(title, subtitle, extra_css), unsafe_allow_html=True)
+
+
+class _SidebarProxy:
+    """
+    Stand-in for `streamlit.sidebar`, installed once per process. Each session
+    points it at its own container through st.session_state["_hc_controls"];
+    with no target set it is the real sidebar. Replaces swapping the global
+    module attribute on every rerun, which leaked between concurrent sessions.
+    """
+
+    def __init__(self, real):
+        self._real = real
+
+    def _target(self):
+        try:
+            target = st.session_state.get("_hc_controls")
+        except Exception:  # outside a script run
+            target = None
+        return self._real if target is None else target
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __enter__(self):
+        return self._target().__enter__()
+
+    def __exit__(self, *exc):
+        return self._target().__exit__(*exc)
+
+
+if vars(_stmod).get("_hc_sidebar_proxy") is None:
+    _stmod._hc_sidebar_proxy = _SidebarProxy(_stmod.sidebar)
+    _stmod.sidebar = _stmod._hc_sidebar_proxy
+
+
+def session_store() -> dict:
+    """Per-session dict for work done once per session (e.g. entrypoint lookups)."""
+    return st.session_state.setdefault("_hc_bootstrapped", {})
+
+
+@st.cache_resource(show_spinner=False)
+def _compiled_cached(path: str, mtime_ns: int):
+    # mtime_ns is part of the cache key: editing the sub-app recompiles it
+    return compile(Path(path).read_bytes(), path, "exec")
+
+
+def _compiled_entrypoint(py_path: Path):
+    """
+    Code object for `py_path`, compiled once per process and shared by every
+    session until the file's mtime changes, so reruns skip the read + parse +
+    compile that runpy.run_path does every time.
+    """
+    return _compiled_cached(str(py_path), py_path.stat().st_mtime_ns)
+
+
+def page_chrome(title: str, subtitle: str, extra_css: str = ""):
+    """Page config, shared-password gate, sidebar nav and header."""
+    st.set_page_config(page_title="HayCash ToolBox", layout="wide", initial_sidebar_state="expanded")
+
+    # Authenticated sessions (the common rerun) skip the import and the call;
+    # the same auth_ok check require_shared_password() starts with
+    if st.session_state.get("auth_ok") is not True:
+        from simple_auth import require_shared_password
+
+        require_shared_password()
+
+    sidebar_nav()
+    signature_header(title, subtitle, extra_css)
+
+
+def _run_subapp(entrypoint: Path, embedded: bool):
+    # card for the sub-app's st.sidebar calls; created here so it belongs to
+    # the fragment (a fragment may only put widgets in its own containers)
+    with st.container(border=True):
+        control_space = st.container()
+
+    try:
+        st.session_state["_hc_controls"] = control_space
+
+        # Safety: a wrong path shows an error instead of a white screen
+        if not entrypoint.exists():
+            raise FileNotFoundError(f"App entrypoint not found: {entrypoint}")
+
+        if embedded:
+            for k in _EMBED_FLAGS:
+                os.environ[k] = "1"
+
+        # No chdir: the cwd is process-wide and shared by every session; the
+        # sub-apps resolve their data files from __file__
+        code = _compiled_entrypoint(entrypoint)
+        exec(code, {"__name__": "__main__", "__file__": str(entrypoint)})
+
+    except Exception as e:
+        # one element: st.exception already shows the type and message
+        st.exception(e)
+
+    finally:
+        st.session_state["_hc_controls"] = None
+
+        if embedded:
+            for k in _EMBED_FLAGS:
+                os.environ.pop(k, None)
+
+
+# Sub-app widgets rerun only the fragment: the chrome above it (CSS, nav,
+# header, auth) is not executed again. st.fragment is 1.37+, older releases
+# have st.experimental_fragment; without either the sub-app runs inline.
+_fragment = vars(st).get("fragment") or vars(st).get("experimental_fragment")
+if _fragment is not None:
+    _run_subapp = _fragment(_run_subapp)
+
+
+def run_subapp(entrypoint: Path, embedded: bool = False):
+    """
+    Run the sub-app script as __main__, in a fragment, with its st.sidebar
+    calls landing in a bordered card (this session only). `embedded` sets
+    the HC_* flags for sub-apps that skip their own page config and auth
+    when wrapped.
+    """
+    _run_subapp(entrypoint, embedded)
+
+
+def launch_subapp(entrypoint: str, title: str, subtitle: str, embedded: bool = False, extra_css: str = ""):
+    """Whole wrapper page: chrome, then the sub-app at `entrypoint` (relative to ROOT)."""
+    page_chrome(title, subtitle, extra_css)
+    run_subapp(ROOT / entrypoint, embedded=embedded)
@@ -1,9 +1,29 @@
-import os
+import hashlib
 import hmac
+import os
 import streamlit as st
 
 
-def _get_user_table() -> tuple[dict, dict]:
+# (key, (users, roles)): the parsed table and a digest of the raw secrets /
+# env content it came from. Rotating or removing a password changes the
+# digest, so the next login check re-reads the table instead of a restart
+_USER_TABLE: tuple[bytes, tuple[dict, dict]] | None = None
+
+
+def _parse_pairs(raw: str) -> dict[str, str]:
+    # 'k1=v1;k2=v2' -> {"k1": "v1", "k2": "v2"}; blank or "="-less items skipped
+    out: dict[str, str] = {}
+    for pair in raw.split(";"):
+        if not pair.strip():
+            continue
+        if "=" not in pair:
+            continue
+        k, v = pair.split("=", 1)
+        out[k.strip()] = v.strip()
+    return out
+
+
+def _read_auth_source() -> tuple:
     # Streamlit Cloud Secrets TOML:
     # [auth.users]
     # Carlos = "..."
@@ -18,40 +38,39 @@ def _get_user_table() -> tuple[dict, dict]:
         auth = st.secrets.get("auth", {})
         users = auth.get("users", {}) or {}
         roles = auth.get("roles", {}) or {}
-        return dict(users), dict(roles)
+        return "secrets", dict(users), dict(roles)
     except Exception:
         pass
 
     # Fallback env var (optional):
     # TOOLBOX_USERS = 'Carlos=pass1;Juan=pass2;Daniel=pass3'
     # TOOLBOX_ROLES = 'Carlos=admin;Juan=user;Daniel=user'
-    users_env = os.getenv("TOOLBOX_USERS", "")
-    roles_env = os.getenv("TOOLBOX_ROLES", "")
-
-    users: dict[str, str] = {}
-    roles: dict[str, str] = {}
-
-    if users_env:
-        for pair in users_env.split(";"):
-            if not pair.strip():
-                continue
-            if "=" not in pair:
-                continue
-            k, v = pair.split("=", 1)
-            users[k.strip()] = v.strip()
-
-    if roles_env:
-        for pair in roles_env.split(";"):
-            if not pair.strip():
-                continue
-            if "=" not in pair:
-                continue
-            k, v = pair.split("=", 1)
-            roles[k.strip()] = v.strip()
+    return "env", os.getenv("TOOLBOX_USERS", ""), os.getenv("TOOLBOX_ROLES", "")
 
+
+def _load_user_table(source: tuple) -> tuple[dict, dict]:
+    kind, users, roles = source
+    if kind == "env":
+        return _parse_pairs(users), _parse_pairs(roles)
     return users, roles
 
 
+def _source_digest(source: tuple) -> bytes:
+    kind, users, roles = source
+    if kind == "secrets":
+        users, roles = sorted(users.items()), sorted(roles.items())
+    return hashlib.sha256(repr((kind, users, roles)).encode("utf-8")).digest()
+
+
+def _get_user_table() -> tuple[dict, dict]:
+    global _USER_TABLE
+    source = _read_auth_source()
+    key = _source_digest(source)
+    if _USER_TABLE is None or _USER_TABLE[0] != key:
+        _USER_TABLE = (key, _load_user_table(source))
+    return _USER_TABLE[1]
+
+
 def require_shared_password() -> None:
     # Backwards-compatible name: app.py doesn't need changes
     if st.session_state.get("auth_ok") is True:
@@ -77,7 +96,7 @@ def require_shared_password() -> None:
     if st.button("Login"):
         stored = users.get(username, "")
         ok_user = bool(stored) and bool(pw)
-        ok_pass = ok_user and hmac.compare_digest(str(stored), str(pw))
+        ok_pass = ok_user and hmac.compare_digest(str(stored).encode("utf-8"), str(pw).encode("utf-8"))
 
         if ok_pass:
             st.session_state["auth_ok"] = True
@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "apps" / "diegobbva"))
+
+from bbva_domiciliacion_fixed import BBVAFixedGenerator, fixed_40_col
+
+
+def test_fixed_40_col_matches_str_upper_for_non_ascii_names():
+    # short columns too: the result must not depend on the longest name
+    for names in (["Muñoß", "Weiß"], ["ﬁdel", "José Ñúñez", "plain"], ["x" * 39 + "ß", "ß"]):
+        got = fixed_40_col(pd.Series(names)).tolist()
+        assert got == [n.upper()[:40].ljust(40) for n in names]
+
+
+def test_details_block_matches_row_wise_detail_for_non_ascii_names():
+    df = pd.DataFrame(
+        {
+            "Importe": ["1,234.50", "10"],
+            "ID Cliente": ["123", "456"],
+            "Nombre del cliente": ["Muñoß", "Weiß"],
+            "Referencia": ["ref ß", "ref"],
+        }
+    )
+    block, total = BBVAFixedGenerator.details_block(df, "20250101", start_ref=1204000)
+    expected = b"".join(
+        BBVAFixedGenerator.detail(
+            i + 2, "20250101", float(row["Importe"].replace(",", "")), 1204000 + i,
+            row["ID Cliente"], row["Nombre del cliente"], row["Referencia"],
+        ).encode("latin-1", errors="replace")[:300].ljust(300) + b"\r\n"
+        for i, (_, row) in enumerate(df.iterrows())
+    )
+    assert block == expected
+    assert total == 123450 + 1000
@@ -0,0 +1,49 @@
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "apps" / "reporte_consejo"))
+
+import main as consejo
+
+
+class _FakeCursor:
+    def __init__(self, results):
+        self._results = list(results)
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self._results.pop(0)
+
+    def close(self):
+        pass
+
+
+class _FakeConn:
+    def __init__(self, results):
+        self._results = results
+
+    def cursor(self):
+        return _FakeCursor(self._results)
+
+
+def test_amortizacion_mensual_sorts_interleaved_months(monkeypatch):
+    conciliations = [
+        (202501, 10.0, 1.0, 0.16, 0, 11.16),
+        (202503, 30.0, 3.0, 0.48, 1, 33.48),
+    ]
+    cartera = [(202502, 200.0), (202504, 400.0)]
+
+    @contextmanager
+    def fake_conn():
+        yield _FakeConn([conciliations, cartera])
+
+    monkeypatch.setattr(consejo, "_conn", fake_conn)
+
+    df = consejo.calcular_amortizacion_mensual("2025-04")
+
+    assert df["Mes"].tolist() == ["2025-01", "2025-02", "2025-03", "2025-04"]
+    assert df["Capital"].tolist() == [10.0, 0.0, 30.0, 0.0]
+    assert df["Valor de la cartera"].tolist() == [0.0, 200.0, 0.0, 400.0]